@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    import brotli # Optional; without it only gzip variants are precomputed
+except ImportError:
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+_CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|/\*.*?\*/', re.S)
+
+
+def minify_css(text):
+    """Drops comments (never inside strings) and blank lines; selectors, strings and values are left as written."""
+    text = _CSS_STRING_OR_COMMENT.sub(lambda m: m.group(1) or '', text)
+    return '\n'.join(line.rstrip() for line in text.splitlines() if line.strip()) + '\n'
+
+
+_JS_TOKEN = re.compile(r"""(?P<space>\s+)
+    |(?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    |(?P<word>[\w$]+)
+    |(?P<punct>.)""", re.S | re.X)
+_JS_REGEX_LITERAL = re.compile(r'/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/')
+_JS_TEMPLATE_TEXT = re.compile(r'(?:\\.|\$(?!\{)|[^`\\$])*', re.S)
+_JS_KEYWORDS_BEFORE_EXPRESSION = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+
+def _js_needs_space(before, after):
+    if (before[-1].isalnum() or before[-1] in '_$') and (after[0].isalnum() or after[0] in '_$' or after[0] > '\x7f'): return True
+    if before[-1] > '\x7f' and (after[0].isalnum() or after[0] in '_$'): return True
+    if before[-1].isdigit() and after[0] == '.': return True # 1 .toString()
+    return before[-1] in '+-/' and after[0] == before[-1] # a - -b, a / /re/
+
+
+def minify_js(text):
+    """Drops comments and collapses whitespace outside strings, template literals
+    and regex literals, which are copied as written. A run of whitespace that held
+    a line break becomes one newline, so automatic semicolon insertion is unchanged."""
+    out, pending, last = [], '', '' # pending: whitespace owed before the next token; last: previous token
+    templates = [] # Open-brace depth inside each enclosing ${...}
+    pos = 0
+    while pos < len(text):
+        ch = text[pos]
+        if ch == '`' or (ch == '}' and templates and templates[-1] == 0):
+            if ch == '}': templates.pop()
+            end = _JS_TEMPLATE_TEXT.match(text, pos + 1).end()
+            if text.startswith('${', end): end += 2; templates.append(0); token = '{'
+            else: end += 1; token = '`'
+            piece = text[pos:end]; pos = end
+        else:
+            m = _JS_TOKEN.match(text, pos)
+            kind, piece = m.lastgroup, m.group()
+            regex = ch == '/' and kind == 'punct' and (last in _JS_KEYWORDS_BEFORE_EXPRESSION or not (last[-1:].isalnum() or last[-1:] in '_$)]}"`'))
+            literal = _JS_REGEX_LITERAL.match(text, pos) if regex else None
+            if literal: piece = literal.group(); token = ')'; pos = literal.end()
+            else:
+                pos = m.end()
+                if kind in ('space', 'comment'): # A // comment's line break follows as its own space token
+                    pending = '\n' if pending == '\n' or '\n' in piece else ' '
+                    continue
+                token = '"' if kind == 'string' else piece
+                if templates and piece == '{': templates[-1] += 1
+                elif templates and piece == '}': templates[-1] -= 1
+        if out and (pending == '\n' or (pending and _js_needs_space(out[-1], piece))): out.append(pending)
+        out.append(piece); pending = ''; last = token
+    return ''.join(out) + '\n'
+
+
+def minify_svg(text):
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.S)
+    return re.sub(r'>\s+<', '><', text).strip()
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js, '.svg': minify_svg}
+
+
+class _Asset:
+    __slots__ = ('content_type', 'variants')
+
+    def __init__(self, content_type, variants):
+        self.content_type = content_type
+        self.variants = variants # {encoding: (body, etag)}, 'identity' always present
+
+
+class AssetPipeline:
+    """Fingerprinted, precompressed static assets served from memory.
+
+    build() minifies the CSS, JS and SVG files under directory (files already
+    named *.min.* are kept as is), names every file after a hash of its content
+    (css/style.css -> css/style.<hash>.css) and precomputes a gzip variant. Brotli variants (if the
+    brotli package is installed) take longer to produce, so with background=True
+    they are compressed on an OS thread and gzip is served until then; a green
+    thread would hold the eventlet/gevent hub for the whole compression.
+    Since a hashed URL never changes content, responses carry an immutable
+    one-year Cache-Control and a strong ETag per encoding, so repeat visits load
+    from the browser cache without a request.
+    """
+    def __init__(self, directory, url_prefix='/assets', minify=True, min_compress_size=256, background=False):
+        self.directory = directory
+        self.background = background
+        self.url_prefix = url_prefix.rstrip('/')
+        self.minify = minify
+        self.min_compress_size = min_compress_size
+        self.manifest = {} # {logical path: hashed path}
+        self._assets = {} # {hashed path: _Asset}
+
+    def build(self):
+        start = time.perf_counter()
+        manifest, assets = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                logical = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                hashed, asset = self._build_one(path, logical)
+                manifest[logical] = hashed; assets[hashed] = asset
+        self.manifest, self._assets = manifest, assets
+        if brotli:
+            if self.background: _start_os_thread(self._add_brotli, list(assets.values()))
+            else: self._add_brotli(assets.values())
+        return time.perf_counter() - start
+
+    def _build_one(self, path, logical):
+        with open(path, 'rb') as f: body = f.read()
+        stem, ext = os.path.splitext(logical)
+        minifier = MINIFIERS.get(ext.lower())
+        if self.minify and minifier and not stem.endswith('.min'): body = minifier(body.decode('utf-8')).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        content_type = mimetypes.guess_type(logical)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'): content_type += '; charset=utf-8'
+        variants = {'identity': (body, f'"{digest}"')}
+        if self._compressible(body, content_type):
+            data = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(data) < len(body): variants['gzip'] = (data, f'"{digest}-gzip"')
+        return f"{stem}.{digest}{ext}", _Asset(content_type, variants)
+
+    def _compressible(self, body, content_type):
+        return len(body) >= self.min_compress_size and not content_type.startswith(('image/png', 'image/jpeg', 'image/gif', 'image/webp'))
+
+    def _add_brotli(self, assets):
+        for asset in assets:
+            body, etag = asset.variants['identity']
+            if not self._compressible(body, asset.content_type): continue
+            data = brotli.compress(body, quality=11)
+            if len(data) < len(body): asset.variants['br'] = (data, etag[:-1] + '-br"')
+
+    def url(self, logical):
+        """Returns the fingerprinted URL of a static file, or None if it isn't part of the build."""
+        hashed = self.manifest.get(logical)
+        return f"{self.url_prefix}/{hashed}" if hashed else None
+
+    def lookup(self, hashed, accept_encoding=''):
+        """Returns (body, content_type, encoding, etag) for the best encoding the client accepts, or None."""
+        asset = self._assets.get(hashed)
+        if asset is None: return None
+        encoding = negotiate_encoding(accept_encoding, asset.variants)
+        body, etag = asset.variants[encoding]
+        return body, asset.content_type, encoding, etag
+
+    def stats(self):
+        totals = {}
+        for asset in self._assets.values():
+            for encoding, (body, _) in asset.variants.items(): totals[encoding] = totals.get(encoding, 0) + len(body)
+        return {'assets': len(self._assets), 'bytes': totals}
+
+
+def _start_os_thread(target, *args):
+    """Runs target(*args) on an OS thread, even when eventlet or gevent has monkey-patched threading."""
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            thread = patcher.original('threading').Thread(target=target, args=args, daemon=True)
+            thread.start(); return thread
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            import gevent
+            return gevent.get_hub().threadpool.spawn(target, *args)
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start(); return thread
+
+
+def negotiate_encoding(accept_encoding, available, preference=('br', 'gzip')):
+    """Picks the preferred available encoding with a non-zero q-value in the Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name: continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try: q = float(match.group(1))
+            except ValueError: q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in preference:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0: return encoding
+    return 'identity'
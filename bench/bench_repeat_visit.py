@@ -0,0 +1,102 @@
+"""Byte and request savings of the asset pipeline on first and repeat visits.
+
+Plays a browser through the welcome page and the video chat page twice (a
+first visit with an empty cache, then a repeat visit) with a minimal HTTP
+cache: responses are reused without a request while their Cache-Control
+max-age holds, and revalidated with If-None-Match / If-Modified-Since
+otherwise. Runs once against the fingerprinted /assets URLs the templates
+use, and once with each asset URL mapped back to Flask's /static handler as
+the templates linked them before (socket.io, then loaded from a CDN, is
+counted as a /static file since the CDN isn't reachable here).
+
+Exits with status 1 unless the repeat visit makes no asset requests and the
+first visit transfers fewer asset bytes than the /static baseline.
+
+    python bench/bench_repeat_visit.py
+    python bench/bench_repeat_visit.py --accept-encoding gzip --output bench/results/repeat_visit.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from loadtest import STUB_ENV
+
+PAGES = ('/', '/video_chat_landing_page')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure asset bytes and requests on first and repeat visits.")
+    parser.add_argument('--accept-encoding', default='gzip, deflate, br')
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+class Browser:
+    """Just enough of a browser cache to tell cached, revalidated and downloaded assets apart."""
+    def __init__(self, client, accept_encoding, rewrite=None):
+        self.client = client; self.accept_encoding = accept_encoding; self.rewrite = rewrite or (lambda url: url)
+        self.cache = {} # {url: {'etag', 'last_modified', 'fresh_until'}}
+
+    def visit(self):
+        stats = {'page_requests': 0, 'page_bytes': 0, 'asset_requests': 0, 'asset_bytes': 0, 'from_cache': 0, 'not_modified': 0}
+        for page in PAGES:
+            html = self.client.get(page, headers={'Accept-Encoding': self.accept_encoding}).get_data(as_text=True)
+            stats['page_requests'] += 1; stats['page_bytes'] += len(html.encode())
+            for url in re.findall(r'(?:src|href)="(/(?:assets|static)/[^"]+)"', html): self.fetch(self.rewrite(url), stats)
+        return stats
+
+    def fetch(self, url, stats):
+        entry = self.cache.get(url)
+        if entry and entry['fresh_until'] > time.time(): stats['from_cache'] += 1; return
+        headers = {'Accept-Encoding': self.accept_encoding}
+        if entry and entry['etag']: headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']: headers['If-Modified-Since'] = entry['last_modified']
+        response = self.client.get(url, headers=headers)
+        body = response.get_data(); response.close()
+        stats['asset_requests'] += 1; stats['asset_bytes'] += len(body)
+        if response.status_code == 304: stats['not_modified'] += 1
+        cache_control = response.headers.get('Cache-Control', '')
+        max_age = re.search(r'max-age=(\d+)', cache_control)
+        fresh_for = int(max_age.group(1)) if max_age and 'no-cache' not in cache_control else 0
+        if response.status_code in (200, 304):
+            self.cache[url] = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                               'fresh_until': time.time() + fresh_for}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.update(STUB_ENV, SOCKETIO_ASYNC_MODE='threading')
+    import server
+    deadline = time.time() + 30 # Brotli variants are compressed in the background
+    while 'br' not in server.asset_pipeline.stats()['bytes'] and time.time() < deadline: time.sleep(0.1)
+    logical_of = {f"{server.asset_pipeline.url_prefix}/{hashed}": logical for logical, hashed in server.asset_pipeline.manifest.items()}
+    results = {}
+    for name, rewrite in (('static_handler', lambda url: f"/static/{logical_of[url]}" if url in logical_of else url), ('asset_pipeline', None)):
+        browser = Browser(server.app.test_client(), args.accept_encoding, rewrite)
+        results[name] = {'first_visit': browser.visit(), 'repeat_visit': browser.visit()}
+    before, after = results['static_handler'], results['asset_pipeline']
+    results['savings'] = {visit: {key: before[visit][key] - after[visit][key] for key in ('asset_requests', 'asset_bytes')}
+                          for visit in ('first_visit', 'repeat_visit')}
+    for name in ('static_handler', 'asset_pipeline'):
+        for visit in ('first_visit', 'repeat_visit'):
+            r = results[name][visit]
+            print(f"{name:>15} {visit:>12}: {r['asset_requests']:>2} asset requests, {r['asset_bytes']:>7} asset bytes "
+                  f"({r['from_cache']} from cache, {r['not_modified']} not modified)")
+    failures = []
+    if after['repeat_visit']['asset_requests']: failures.append(f"repeat visit made {after['repeat_visit']['asset_requests']} asset requests")
+    if after['first_visit']['asset_bytes'] >= before['first_visit']['asset_bytes']: failures.append("first visit did not transfer fewer asset bytes")
+    for failure in failures: print(f"FAIL {failure}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'pages': PAGES, 'results': results, 'failures': failures}, f, indent=2)
+    if failures: sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Micro-benchmark: per-event cost of /video room lookups from 10 to 10k rooms.
+
+Times the registry operations behind each handler (signal and subtitle-text
+name lookups, join, leave/disconnect) against the scans the handlers used before
+the registry (a {room_id: {sid: name}} dict searched with next(...) and a walk
+over every room on disconnect). The registry's cost should stay flat as rooms
+grow; the old scans grow linearly.
+
+    python bench/bench_room_registry.py
+    python bench/bench_room_registry.py --rooms 10,100,1000,10000 --output bench/results/room_registry.json
+
+Exits with status 1 if any registry operation costs more than --max-ratio times
+as much at the largest room count as at the smallest.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from room_state import VideoRoomRegistry
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /video room lookups against the number of rooms.")
+    parser.add_argument('--rooms', default='10,100,1000,10000', help="Comma-separated room counts.")
+    parser.add_argument('--occupants', type=int, default=4, help="Participants per room.")
+    parser.add_argument('--ops', type=int, default=20000, help="Operations timed per measurement.")
+    parser.add_argument('--repeat', type=int, default=5, help="Measurements per operation; the best is reported.")
+    parser.add_argument('--max-ratio', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def best_ns_per_op(fn, ops, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(ops)
+        best = min(best, (time.perf_counter() - start) / ops)
+    return round(best * 1e9, 1)
+
+
+def measure(rooms, args):
+    rng = random.Random(args.seed)
+    registry = VideoRoomRegistry()
+    legacy = {} # The pre-registry layout: {room_id: {sid: name}}
+    sids = []
+    for r in range(rooms):
+        room_id = f"R{r:06d}"
+        for o in range(args.occupants):
+            sid = f"sid{r:06d}_{o}"
+            registry.join(room_id, sid, f"User {o}")
+            legacy.setdefault(room_id, {})[sid] = f"User {o}"
+            sids.append((sid, room_id))
+    probes = [rng.choice(sids) for _ in range(1024)]
+    room_ids = list(legacy)
+
+    def signal(n):
+        for i in range(n): registry.name_of(probes[i & 1023][0], default="Unknown")
+
+    def subtitle(n):
+        for i in range(n): sid, room_id = probes[i & 1023]; registry.name_of(sid, room_id)
+
+    def join_leave(n):
+        for i in range(n):
+            registry.join(room_ids[i % rooms], 'bench-sid', 'Bench')
+            registry.leave('bench-sid')
+
+    def legacy_signal(n):
+        for i in range(n):
+            sid = probes[i & 1023][0]
+            next((occupants[sid] for occupants in legacy.values() if sid in occupants), "Unknown")
+
+    def legacy_disconnect(n):
+        for i in range(n):
+            sid = probes[i & 1023][0]
+            for room_id, occupants in list(legacy.items()):
+                if sid in occupants: break
+
+    # The legacy scans are O(rooms); time fewer of them so large room counts finish quickly.
+    legacy_ops = max(50, args.ops * 10 // rooms)
+    return {
+        'rooms': rooms, 'sids': len(sids),
+        'registry_ns': {'signal': best_ns_per_op(signal, args.ops, args.repeat),
+                        'subtitle': best_ns_per_op(subtitle, args.ops, args.repeat),
+                        'join_leave': best_ns_per_op(join_leave, args.ops, args.repeat)},
+        'legacy_scan_ns': {'signal': best_ns_per_op(legacy_signal, legacy_ops, args.repeat),
+                           'disconnect': best_ns_per_op(legacy_disconnect, legacy_ops, args.repeat)},
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = [measure(int(rooms), args) for rooms in args.rooms.split(',')]
+    print(f"{'rooms':>7} {'signal':>9} {'subtitle':>9} {'join+leave':>11} | {'old signal':>11} {'old disconnect':>15}  (ns/event)")
+    for r in results:
+        reg, old = r['registry_ns'], r['legacy_scan_ns']
+        print(f"{r['rooms']:>7} {reg['signal']:>9} {reg['subtitle']:>9} {reg['join_leave']:>11} | {old['signal']:>11} {old['disconnect']:>15}")
+    first, last = results[0]['registry_ns'], results[-1]['registry_ns']
+    ratios = {op: round(last[op] / first[op], 2) for op in first}
+    print(f"registry cost ratio {results[-1]['rooms']} vs {results[0]['rooms']} rooms: {ratios}")
+    report = {'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'results': results, 'registry_ratio': ratios}
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    if any(ratio > args.max_ratio for ratio in ratios.values()):
+        print(f"FAIL: registry cost grew more than {args.max_ratio}x"); sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Concurrent websocket connections per process: serve.py modes vs the old debug entry point.
+
+For each server mode, runs loadtest.py with growing numbers of mostly idle
+clients (all connected at once, joined to rooms, with light signalling) and
+records how many connected, join/signal latency and server RSS. A step counts
+as sustained when every client connected and signal p99 stayed under
+--max-p99-ms; a mode stops at its first unsustained step.
+
+Modes:
+  debug            socketio.run(app, debug=True) as server.py's __main__ runs it:
+                   async mode auto-detected (eventlet when installed) and nothing
+                   monkey-patched, so blocking I/O stalls every client
+  debug-threading  the same entry point without eventlet/gevent installed
+  threading, eventlet, gevent
+                   serve.py --mode <mode>
+
+    python bench/bench_serve_modes.py
+    python bench/bench_serve_modes.py --steps 250,500,1000 --modes debug,eventlet --output bench/results/serve_modes.json
+
+Clients and server share the machine, so absolute numbers are a lower bound; the
+comparison between modes is the point.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import loadtest
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare concurrent /video connections per process across server modes.")
+    parser.add_argument('--modes', default='debug,debug-threading,threading,eventlet,gevent')
+    parser.add_argument('--steps', default='250,500,1000,2000', help="Client counts to try, in increasing order.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of traffic per step once everyone is connected.")
+    parser.add_argument('--max-p99-ms', type=float, default=1000.0)
+    parser.add_argument('--port', type=int, default=5300)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def run_step(mode, clients, args):
+    server_mode = 'debug' if mode.startswith('debug') else mode
+    env_before = os.environ.get('SOCKETIO_ASYNC_MODE')
+    if mode == 'debug-threading': os.environ['SOCKETIO_ASYNC_MODE'] = 'threading'
+    try:
+        report = loadtest.main(['--mode', server_mode, '--port', str(args.port), '--clients', str(clients), '--duration', str(args.duration),
+                                '--room-sizes', '4:1', '--signal-rate', '0.1', '--subtitle-rate', '0.05', '--churn-rate', '0',
+                                '--connect-concurrency', '100'])
+    finally:
+        if env_before is None: os.environ.pop('SOCKETIO_ASYNC_MODE', None)
+        else: os.environ['SOCKETIO_ASYNC_MODE'] = env_before
+    latency = report['latency']
+    return {'clients': clients, 'connected': report['connected'], 'connect_failures': report['connect_failures'],
+            'connect_time_s': report['connect_time_s'],
+            'join_p99_ms': (latency.get('join') or {}).get('p99_ms'), 'signal_p99_ms': (latency.get('signal') or {}).get('p99_ms'),
+            'dropped_signals': report['dropped_signals'], 'server_rss_mb': report['server_rss_mb']['after']}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    for mode in args.modes.split(','):
+        results[mode] = {'steps': [], 'max_sustained_clients': 0}
+        for clients in (int(n) for n in args.steps.split(',')):
+            step = run_step(mode, clients, args)
+            step['sustained'] = step['connected'] == clients and (step['signal_p99_ms'] or 0) <= args.max_p99_ms
+            results[mode]['steps'].append(step)
+            print(f"{mode:>16} {clients:>6} clients: {step}", file=sys.stderr)
+            if not step['sustained']: break
+            results[mode]['max_sustained_clients'] = clients
+    print(f"{'mode':>16} {'max sustained':>14} {'RSS at max (MB)':>16} {'signal p99 at max (ms)':>23}")
+    for mode, r in results.items():
+        at_max = next((s for s in r['steps'] if s['clients'] == r['max_sustained_clients']), {})
+        print(f"{mode:>16} {r['max_sustained_clients']:>14} {str(at_max.get('server_rss_mb')):>16} {str(at_max.get('signal_p99_ms')):>23}")
+    report = {'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'git_commit': loadtest.git_commit(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Headless SFU benchmark: uplinks per client and server CPU, mesh vs SFU rooms.
+
+Starts serve.py with SFU workers and fills one room at a time with synthetic
+aiortc clients (a small generated video track each, no browser). For every
+room size it runs:
+
+  mesh  clients join a plain room; uplinks per client is the number of peers
+        the server tells it to connect to (N - 1). Media would flow
+        peer-to-peer, so server CPU is signalling only.
+  sfu   clients join with topology 'sfu', publish their track once and
+        subscribe to everyone else's through the SFU workers; uplinks per
+        client is the number of its peer connections that send media (1).
+
+Server CPU is the user+system time of the serve.py process and its SFU worker
+processes over --duration seconds of steady media, read from /proc, as a share
+of one core. Clients run on the same machine: when frames received fall well
+short of frames expected, the host is saturated and the CPU figure is a floor.
+
+    python bench/bench_sfu.py
+    python bench/bench_sfu.py --sizes 4,8,16 --duration 10 --output bench/results/sfu.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from loadtest import STUB_ENV, wait_until_up
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+VIDEO_FPS = 30 # aiortc's VideoStreamTrack frame rate
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare uplinks and server CPU for mesh and SFU rooms.")
+    parser.add_argument('--sizes', default='4,8,16', help="Participants per room, one run each.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of steady media to measure CPU over.")
+    parser.add_argument('--settle', type=float, default=5.0, help="Seconds to let ICE and the first frames settle before measuring.")
+    parser.add_argument('--width', type=int, default=160)
+    parser.add_argument('--height', type=int, default=120)
+    parser.add_argument('--sfu-workers', type=int, default=2)
+    parser.add_argument('--mode', choices=['eventlet', 'gevent', 'threading'], default='threading')
+    parser.add_argument('--port', type=int, default=5400)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def process_tree_cpu(pid):
+    """Returns CPU seconds used so far by pid and its direct children."""
+    total = 0.0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit(): continue
+        try:
+            with open(f"/proc/{entry}/stat") as f: fields = f.read().rsplit(')', 1)[1].split()
+        except OSError: continue
+        if int(entry) == pid or int(fields[1]) == pid: total += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return total
+
+
+def synthetic_track(width, height):
+    import av
+    from aiortc import VideoStreamTrack
+
+    class SyntheticTrack(VideoStreamTrack):
+        """A moving gradient, so the encoder has something to do."""
+        async def recv(self):
+            pts, time_base = await self.next_timestamp()
+            frame = av.VideoFrame(width=width, height=height, format='yuv420p')
+            shade = pts // 3000 % 256
+            for i, plane in enumerate(frame.planes): plane.update(bytes([shade if i == 0 else 128]) * plane.buffer_size)
+            frame.pts = pts; frame.time_base = time_base
+            return frame
+    return SyntheticTrack()
+
+
+class Client:
+    def __init__(self, index, url, room, topology, args):
+        self.index = index; self.url = url; self.room = room; self.topology = topology; self.args = args
+        self.peers = set()
+        self.joined = asyncio.Event(); self.published = asyncio.Event()
+        self.publish_pc = None; self.subscribe_pc = None
+        self.frames = 0
+        self._consumers = []
+
+    async def start(self):
+        import socketio
+        self.sio = socketio.AsyncClient(reconnection=False)
+        on = lambda event, handler: self.sio.on(event, handler, namespace='/video')
+        on('joined-room', self._on_joined)
+        on('other-users', lambda d: self.peers.update(u['sid'] for u in d['users']))
+        on('user-joined', lambda d: self.peers.add(d['sid']))
+        on('user-left', lambda d: self.peers.discard(d['sid']))
+        on('sfu-publish-answer', self._on_publish_answer)
+        on('sfu-subscribe-offer', self._on_subscribe_offer)
+        on('sfu-error', lambda d: print(f"client {self.index}: sfu-error {d}", file=sys.stderr))
+        await self.sio.connect(self.url, namespaces=['/video'], transports=['websocket'])
+        await self.sio.emit('join', {'room': self.room, 'name': f"Synth{self.index}", 'topology': self.topology}, namespace='/video')
+        await asyncio.wait_for(self.joined.wait(), 10)
+
+    async def _on_joined(self, data):
+        self.topology = data['topology']; self.joined.set()
+
+    async def publish(self):
+        from aiortc import RTCPeerConnection
+        self.publish_pc = RTCPeerConnection()
+        self.publish_pc.addTrack(synthetic_track(self.args.width, self.args.height))
+        await self.publish_pc.setLocalDescription(await self.publish_pc.createOffer())
+        await self.sio.emit('sfu-publish', {'room': self.room, 'sdp': self.publish_pc.localDescription.sdp, 'type': 'offer'}, namespace='/video')
+        await asyncio.wait_for(self.published.wait(), 30)
+
+    async def _on_publish_answer(self, data):
+        from aiortc import RTCSessionDescription
+        await self.publish_pc.setRemoteDescription(RTCSessionDescription(sdp=data['sdp'], type=data['type']))
+        self.published.set()
+
+    async def subscribe(self):
+        await self.sio.emit('sfu-subscribe', {'room': self.room}, namespace='/video')
+
+    async def _on_subscribe_offer(self, data):
+        from aiortc import RTCPeerConnection, RTCSessionDescription
+        if self.subscribe_pc: await self.subscribe_pc.close()
+        pc = self.subscribe_pc = RTCPeerConnection()
+        pc.on('track', lambda track: self._consumers.append(asyncio.ensure_future(self._consume(track))))
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=data['sdp'], type=data['type']))
+        await pc.setLocalDescription(await pc.createAnswer())
+        await self.sio.emit('sfu-subscribe-answer', {'room': self.room, 'sdp': pc.localDescription.sdp, 'type': 'answer'}, namespace='/video')
+
+    async def _consume(self, track):
+        try:
+            while True: await track.recv(); self.frames += 1
+        except Exception: pass
+
+    def uplinks(self):
+        """Peer connections this client sends its own media on."""
+        if self.topology == 'mesh': return len(self.peers)
+        return sum(1 for pc in (self.publish_pc,) if pc and any(t.sender.track for t in pc.getTransceivers()))
+
+    async def close(self):
+        for task in self._consumers: task.cancel()
+        for pc in (self.publish_pc, self.subscribe_pc):
+            if pc: await pc.close()
+        try: await self.sio.disconnect()
+        except Exception: pass
+
+
+async def run_room(url, server_pid, size, topology, args):
+    room = f"BENCH-{topology}-{size}"
+    clients = [Client(i, url, room, topology, args) for i in range(size)]
+    for client in clients: await client.start() # Sequential so the first joiner creates the SFU room
+    if topology == 'sfu':
+        if any(c.topology != 'sfu' for c in clients): raise RuntimeError("Room did not switch to SFU; is aiortc installed on the server?")
+        await asyncio.gather(*(c.publish() for c in clients))
+        await asyncio.gather(*(c.subscribe() for c in clients))
+    await asyncio.sleep(args.settle)
+    frames_before = sum(c.frames for c in clients)
+    cpu_before = process_tree_cpu(server_pid); started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    cpu = process_tree_cpu(server_pid) - cpu_before; elapsed = time.perf_counter() - started
+    frames = sum(c.frames for c in clients) - frames_before
+    uplinks = [c.uplinks() for c in clients]
+    await asyncio.gather(*(c.close() for c in clients))
+    await asyncio.sleep(1.0) # Let the server tear the room down before the next run
+    return {'participants': size, 'topology': topology,
+            'uplinks_per_client': {'min': min(uplinks), 'max': max(uplinks)},
+            'uplinks_total': sum(uplinks),
+            'server_cpu_pct_of_core': round(100 * cpu / elapsed, 1),
+            'frames_received_per_client_per_s': round(frames / size / elapsed, 1),
+            'frames_expected_per_client_per_s': (size - 1) * VIDEO_FPS if topology == 'sfu' else 0}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, **dict(STUB_ENV, SFU_WORKERS=str(args.sfu_workers), SFU_AUTO_THRESHOLD='0'))
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', args.mode, '--host', '127.0.0.1', '--port', str(args.port)],
+                            cwd=ROOT, env=env)
+    runs = []
+    try:
+        wait_until_up(url)
+        for size in (int(n) for n in args.sizes.split(',')):
+            for topology in ('mesh', 'sfu'):
+                run = asyncio.run(run_room(url, proc.pid, size, topology, args))
+                runs.append(run)
+                print(f"{size:>3} participants {topology:>4}: uplinks/client {run['uplinks_per_client']['max']:>2}  "
+                      f"server CPU {run['server_cpu_pct_of_core']:>5}% of a core  frames/client/s {run['frames_received_per_client_per_s']} of {run['frames_expected_per_client_per_s']}")
+    finally:
+        proc.terminate(); proc.wait()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'cpu_count': os.cpu_count(), 'runs': runs}, f, indent=2)
+    return runs
+
+
+if __name__ == '__main__':
+    main()
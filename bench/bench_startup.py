@@ -0,0 +1,124 @@
+"""Startup benchmark and regression guard for worker cold start.
+
+Measures, with SMTP and Calendar stubbed:
+
+  - an -X importtime breakdown of `import server`: total and the slowest
+    modules it imports directly, and whether any integration that should load lazily
+    (Google API client, OAuth, smtplib, email.mime) was imported anyway
+  - time from starting serve.py to the first 200 response for /, and the
+    server's RSS at that point and again once the background integration
+    warm-up has run
+
+Each figure is the median of --runs runs. Exits with status 1 if a lazy module
+is imported at startup or, given --baseline, if a median exceeds the baseline's
+by more than --tolerance.
+
+    python bench/bench_startup.py
+    python bench/bench_startup.py --output bench/results/startup.json
+    python bench/bench_startup.py --baseline bench/results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from loadtest import STUB_ENV, rss_mb
+
+LAZY_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'google.oauth2', 'smtplib', 'email.mime')
+GUARDED = ('import_ms', 'first_response_s', 'rss_at_first_response_mb')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure and guard server startup time and memory.")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--mode', choices=['eventlet', 'gevent', 'threading'], default='eventlet')
+    parser.add_argument('--port', type=int, default=5500)
+    parser.add_argument('--warmup-delay', type=float, default=1.0, help="INTEGRATION_WARMUP_DELAY for the serve.py runs.")
+    parser.add_argument('--top', type=int, default=15, help="Slowest direct imports of server to report.")
+    parser.add_argument('--baseline', help="Fail if a median is more than --tolerance above this earlier result.")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def import_profile():
+    """Runs `import server` under -X importtime; returns (total_ms, {module server imports directly: ms}, [all modules])."""
+    env = dict(os.environ, **STUB_ENV, SOCKETIO_ASYNC_MODE='threading')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import server'], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    total, direct, modules = 0.0, {}, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line: continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2 # One space, then two per nesting level
+        modules.append(name.strip())
+        if depth == 1: direct[name.strip()] = int(cumulative) / 1000 # Children are listed before their parent
+        elif depth == 0 and name.strip() == 'server': total = int(cumulative) / 1000
+        elif depth == 0: direct.clear()
+    return total, direct, modules
+
+
+def first_response(args):
+    """Starts serve.py; returns (seconds to the first / response, RSS then, RSS after the warm-up)."""
+    env = dict(os.environ, **dict(STUB_ENV, INTEGRATION_WARMUP_DELAY=str(args.warmup_delay)))
+    url = f"http://127.0.0.1:{args.port}/"
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', args.mode, '--host', '127.0.0.1', '--port', str(args.port)],
+                            cwd=ROOT, env=env)
+    try:
+        while True:
+            if proc.poll() is not None: raise RuntimeError(f"serve.py exited with status {proc.returncode}")
+            if time.perf_counter() - started > 60: raise RuntimeError("serve.py did not answer / within 60s")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200: break
+            except Exception: time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        rss_first = rss_mb(proc.pid)
+        time.sleep(args.warmup_delay + 3) # Mail and calendar modules load in the background
+        return elapsed, rss_first, rss_mb(proc.pid)
+    finally:
+        proc.terminate(); proc.wait()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    imports, responses = [], []
+    for _ in range(args.runs):
+        imports.append(import_profile())
+        responses.append(first_response(args))
+    total_ms, direct, modules = sorted(imports, key=lambda i: i[0])[len(imports) // 2]
+    eagerly_loaded = sorted({lazy for lazy in LAZY_MODULES for name in modules if name == lazy or name.startswith(lazy + '.')})
+    result = {
+        'import_ms': round(total_ms, 1),
+        'slowest_imports_ms': {name: round(ms, 1) for name, ms in sorted(direct.items(), key=lambda kv: -kv[1])[:args.top]},
+        'lazy_modules_imported_at_startup': eagerly_loaded,
+        'first_response_s': round(statistics.median(r[0] for r in responses), 3),
+        'rss_at_first_response_mb': round(statistics.median(r[1] for r in responses), 1),
+        'rss_after_warmup_mb': round(statistics.median(r[2] for r in responses), 1),
+    }
+    print(f"import server: {result['import_ms']} ms; first / response after {result['first_response_s']} s; "
+          f"RSS {result['rss_at_first_response_mb']} MB, {result['rss_after_warmup_mb']} MB after warm-up")
+    for name, ms in result['slowest_imports_ms'].items(): print(f"  {ms:>8} ms  {name}")
+    failures = [f"{name} imported at startup" for name in eagerly_loaded]
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)['result']
+        for key in GUARDED:
+            limit = baseline[key] * (1 + args.tolerance)
+            if result[key] > limit: failures.append(f"{key} {result[key]} exceeds baseline {baseline[key]} by more than {args.tolerance:.0%}")
+    for failure in failures: print(f"FAIL {failure}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'result': result, 'failures': failures}, f, indent=2)
+    if failures: sys.exit(1)
+    return result
+
+
+if __name__ == '__main__':
+    main()
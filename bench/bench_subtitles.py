@@ -0,0 +1,100 @@
+"""Benchmark: subtitle fan-out with simulated speakers, batched vs one emit per event.
+
+Rooms of Flask-SocketIO test clients join through the real /video handlers, and
+some participants per room "speak": every tick they send a subtitle-text event
+the way the Speech API reports results (several interim results, then a final
+one). The same traffic goes once through the handler as it was before batching
+(an immediate new-subtitle emit to the room per event) and once through the
+current handler and SubtitleAggregator. Reports emits, frames delivered to
+clients and process CPU time for each.
+
+    python bench/bench_subtitles.py
+    python bench/bench_subtitles.py --rooms 20 --room-size 8 --speakers 3 --output bench/results/subtitles.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from loadtest import STUB_ENV
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare batched and per-event subtitle fan-out.")
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--room-size', type=int, default=8)
+    parser.add_argument('--speakers', type=int, default=3, help="Speaking participants per room.")
+    parser.add_argument('--results-per-second', type=float, default=10.0, help="Recognition results per speaker per second.")
+    parser.add_argument('--final-every', type=int, default=8, help="Every Nth result is final; the rest are interim.")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def load_server():
+    os.environ.update(STUB_ENV, SOCKETIO_ASYNC_MODE='threading')
+    import server
+    from flask_socketio import emit
+
+    @server.socketio.on('legacy-subtitle-text', namespace='/video')
+    def legacy_subtitle_text(data):
+        """The subtitle handler as it was before batching: one emit per event to everyone else in the room."""
+        from flask import request
+        room_id = data.get('room'); sender_sid = request.sid
+        name = server.video_rooms.name_of(sender_sid, room_id, data.get('name'))
+        if room_id and data.get('text'): emit('new-subtitle', {'text': data['text'], 'sender_sid': sender_sid, 'name': name}, room=room_id, include_self=False)
+    return server
+
+
+def run(server, event, args):
+    clients = []
+    for r in range(args.rooms):
+        for i in range(args.room_size):
+            client = server.socketio.test_client(server.app, namespace='/video')
+            client.emit('join', {'room': f"{event}-{r}", 'name': f"U{i}"}, namespace='/video')
+            clients.append((f"{event}-{r}", i, client))
+    for _, _, client in clients: client.get_received('/video')
+    speakers = [(room_id, client) for room_id, i, client in clients if i < args.speakers]
+    emits_before = server.subtitle_aggregator.batches
+    interval = 1 / args.results_per_second
+    cpu_start = time.process_time(); wall_start = time.perf_counter()
+    tick = 0; events = 0
+    while time.perf_counter() - wall_start < args.duration:
+        tick += 1
+        final = tick % args.final_every == 0
+        for room_id, client in speakers:
+            client.emit(event, {'room': room_id, 'text': f"words so far at tick {tick}", 'partial': not final}, namespace='/video')
+            events += 1
+        time.sleep(max(0.0, wall_start + tick * interval - time.perf_counter()))
+    time.sleep(server.subtitle_aggregator.window * 2) # Let the last batches flush
+    cpu = time.process_time() - cpu_start
+    frames = sum(len(client.get_received('/video')) for _, _, client in clients)
+    for _, _, client in clients: client.disconnect(namespace='/video')
+    emits = events if event == 'legacy-subtitle-text' else server.subtitle_aggregator.batches - emits_before
+    return {'events': events, 'emits': emits, 'frames_delivered': frames, 'cpu_s': round(cpu, 3),
+            'cpu_ms_per_room_per_s': round(cpu * 1000 / args.rooms / args.duration, 3)}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = load_server()
+    results = {'per_event': run(server, 'legacy-subtitle-text', args), 'batched': run(server, 'subtitle-text', args)}
+    before, after = results['per_event'], results['batched']
+    results['reduction'] = {k: round(1 - after[k] / before[k], 3) if before[k] else None for k in ('emits', 'frames_delivered', 'cpu_s')}
+    print(f"{args.rooms} rooms x {args.room_size} participants, {args.speakers} speakers/room at {args.results_per_second} results/s for {args.duration}s")
+    for name in ('per_event', 'batched'):
+        r = results[name]
+        print(f"{name:>10}: {r['emits']:>7} emits  {r['frames_delivered']:>8} frames  {r['cpu_s']:>7} s CPU ({r['cpu_ms_per_room_per_s']} ms per room-second)")
+    print(f" reduction: {results['reduction']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'window_s': server.subtitle_aggregator.window,
+                       'max_per_second': server.subtitle_aggregator.max_per_second, 'results': results}, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Load benchmark: concurrent login/verify traffic on users.db, UserStore vs per-call connects.
+
+Threads run a mix of the queries behind the login, login_required, OTP and verify
+paths against a scratch database, once with the code the routes used before
+UserStore (a fresh sqlite3.connect() per query, rollback journal) and once with
+UserStore (pooled WAL connections). Reports throughput, p50/p99 latency and
+"database is locked" failures per implementation.
+
+    python bench/bench_user_store.py
+    python bench/bench_user_store.py --threads 32 --duration 10 --output bench/results/user_store.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from user_store import UserStore
+
+MIX = (('login', 30), ('page', 50), ('set_otp', 15), ('verify', 5))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark concurrent login/verify traffic on the users table.")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per implementation.")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+class LegacyUsers:
+    """The queries as the routes ran them before UserStore: one connection per call."""
+    def __init__(self, db_path): self.db_path = db_path
+
+    def init_schema(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                            password TEXT NOT NULL, otp TEXT, verified INTEGER DEFAULT 0)''')
+
+    def create(self, username, password, otp):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO users (username, password, otp, verified) VALUES (?, ?, ?, 0)", (username, password, otp))
+
+    def get_by_credentials(self, username, password):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            return conn.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password)).fetchone()
+
+    def is_verified(self, username):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT verified FROM users WHERE username = ?", (username,)).fetchone()
+            return bool(row and row['verified'])
+
+    def set_otp(self, username, otp):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE users SET otp = ? WHERE username = ?", (otp, username))
+
+    def mark_verified(self, username, otp):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+            if user and user['otp'] == otp:
+                conn.execute("UPDATE users SET verified = 1, otp = NULL WHERE username = ?", (username,)); conn.commit()
+                return True
+        return False
+
+
+def run(store, args):
+    store.init_schema()
+    for i in range(args.users): store.create(f"user{i}@cloudkeeper.com", 'pw', None)
+    ops, weights = zip(*MIX)
+    latencies = {op: [] for op in ops}
+    errors = {'locked': 0, 'other': 0}
+    stop_at = time.perf_counter() + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = {op: [] for op in ops}
+        while time.perf_counter() < stop_at:
+            op = rng.choices(ops, weights)[0]
+            username = f"user{rng.randrange(args.users)}@cloudkeeper.com"
+            start = time.perf_counter()
+            try:
+                if op == 'login': store.get_by_credentials(username, 'pw')
+                elif op == 'page': store.is_verified(username)
+                elif op == 'set_otp': store.set_otp(username, str(rng.randint(100000, 999999)))
+                else:
+                    otp = str(rng.randint(100000, 999999))
+                    store.set_otp(username, otp); store.mark_verified(username, otp)
+            except sqlite3.OperationalError as e:
+                errors['locked' if 'locked' in str(e) else 'other'] += 1; continue
+            local[op].append(time.perf_counter() - start)
+        for op, values in local.items(): latencies[op].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.threads)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    def percentile(values, q): return round(sorted(values)[min(len(values) - 1, int(q * len(values)))] * 1000, 3) if values else None
+    everything = [v for values in latencies.values() for v in values]
+    return {'ops': len(everything), 'ops_per_s': round(len(everything) / args.duration, 1), 'errors': errors,
+            'p50_ms': percentile(everything, 0.5), 'p99_ms': percentile(everything, 0.99),
+            'by_op': {op: {'count': len(v), 'p50_ms': percentile(v, 0.5), 'p99_ms': percentile(v, 0.99)} for op, v in latencies.items()}}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        results['per_call_connect'] = run(LegacyUsers(os.path.join(tmp, 'legacy.db')), args)
+        store = UserStore(os.path.join(tmp, 'pooled.db'))
+        results['user_store'] = run(store, args)
+        store.close()
+    print(f"{args.threads} threads, {args.duration}s each")
+    for name, r in results.items():
+        print(f"{name:>17}: {r['ops_per_s']:>9} ops/s  p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}")
+    report = {'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
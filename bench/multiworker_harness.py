@@ -0,0 +1,204 @@
+"""Multi-process harness: one /video room spread across several worker processes.
+
+Starts N serve.py workers sharing a Redis message queue and room registry, then
+connects the participants of one room round-robin to different workers and
+checks that what one worker emits reaches clients on the others:
+
+  - other-users lists everyone who joined earlier, on any worker
+  - user-joined reaches earlier participants
+  - signal reaches its target from every other participant
+  - new-subtitles reaches every other participant
+  - user-left reaches the rest after an explicit leave and after a disconnect
+
+Uses --redis-url if given, otherwise starts redis-server from PATH on a free
+port. With neither it prints SKIP and exits with status 77. Exits with status 1
+if any check fails.
+
+--fakeredis runs against fakeredis's TCP server instead. fakeredis loses pub/sub
+messages and fails script calls over TCP often enough that most runs fail, so
+failing runs are retried (--attempts) and then reported as inconclusive with
+exit status 0; only a real Redis can fail the harness.
+
+    python bench/multiworker_harness.py --workers 3 --participants 6
+    python bench/multiworker_harness.py --redis-url redis://localhost:6379/15 --mode gevent
+    python bench/multiworker_harness.py --fakeredis --attempts 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from loadtest import STUB_ENV, wait_until_up
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check /video events across worker processes.")
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--participants', type=int, default=6)
+    parser.add_argument('--mode', choices=['eventlet', 'gevent', 'threading'], default='eventlet')
+    parser.add_argument('--port', type=int, default=5200, help="First worker port; workers use consecutive ports.")
+    parser.add_argument('--redis-url', help="Use this Redis instead of starting redis-server.")
+    parser.add_argument('--fakeredis', action='store_true', help="Use fakeredis's TCP server; failures are inconclusive.")
+    parser.add_argument('--attempts', type=int, default=3, help="Runs to try with --fakeredis before calling it inconclusive.")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Seconds to wait for each expected event.")
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0)); return s.getsockname()[1]
+
+
+SKIPPED = 77 # Exit status for "not run", as automake and meson read it
+
+
+def start_redis(fake=False):
+    """Starts redis-server, or fakeredis's TCP server if fake, on a free port; returns (url, process)."""
+    port = free_port()
+    if fake:
+        proc = subprocess.Popen([sys.executable, '-c', "import fakeredis, sys; fakeredis.TcpFakeServer(('127.0.0.1', int(sys.argv[1]))).serve_forever()", str(port)])
+    else:
+        proc = subprocess.Popen(['redis-server', '--port', str(port), '--bind', '127.0.0.1', '--save', ''], stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try: socket.create_connection(('127.0.0.1', port), timeout=0.5).close(); break
+        except OSError: time.sleep(0.1)
+    return f"redis://127.0.0.1:{port}/0", proc
+
+
+class Participant:
+    def __init__(self, index, url):
+        self.index = index; self.url = url; self.name = f"P{index}"
+        self.sid = None
+        self.events = [] # [(event, data)]
+        self._changed = asyncio.Event()
+
+    async def connect(self):
+        import socketio
+        self.sio = socketio.AsyncClient(reconnection=False)
+        for event in ('joined-room', 'other-users', 'user-joined', 'user-left', 'signal', 'new-subtitles'):
+            self.sio.on(event, self._recorder(event), namespace='/video')
+        await self.sio.connect(self.url, namespaces=['/video'], transports=['websocket'])
+
+    def _recorder(self, event):
+        async def record(data):
+            if event == 'joined-room': self.sid = data['sid']
+            self.events.append((event, data)); self._changed.set()
+        return record
+
+    async def wait_for(self, predicate, timeout):
+        """Waits until an event satisfies predicate(event, data); returns whether one did."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if any(predicate(event, data) for event, data in self.events): return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: return False
+            self._changed.clear()
+            try: await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError: pass
+
+    async def emit(self, event, data): await self.sio.emit(event, data, namespace='/video')
+
+
+async def run_checks(urls, args):
+    room = 'HARNESS'
+    checks = []
+    def check(name, ok, detail=''):
+        checks.append({'check': name, 'ok': ok, 'detail': detail})
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {detail}")
+
+    participants = [Participant(i, urls[i % len(urls)]) for i in range(args.participants)]
+    for p in participants:
+        await p.connect()
+        await p.emit('join', {'room': room, 'name': p.name})
+        check(f"{p.name} joined via worker {p.index % len(urls)}", await p.wait_for(lambda e, d: e == 'joined-room', args.timeout))
+        expected = {q.sid for q in participants[:p.index]}
+        if expected:
+            listed = {u['sid'] for e, d in p.events if e == 'other-users' for u in d['users']}
+            check(f"{p.name} other-users lists earlier participants", listed == expected, f"{len(listed)}/{len(expected)}")
+    for p in participants:
+        later = {q.sid for q in participants[p.index + 1:]}
+        seen = {}
+        for sid in later:
+            seen[sid] = await p.wait_for(lambda e, d, sid=sid: e == 'user-joined' and d['sid'] == sid, args.timeout)
+        if later: check(f"{p.name} got user-joined for later participants", all(seen.values()), f"{sum(seen.values())}/{len(later)}")
+
+    for sender in participants:
+        for target in participants:
+            if target is not sender: await sender.emit('signal', {'target_sid': target.sid, 'type': 'offer', 'payload': {'from': sender.name}})
+    for target in participants:
+        senders = [p for p in participants if p is not target]
+        got = [await target.wait_for(lambda e, d, s=s: e == 'signal' and d['sender_sid'] == s.sid and d['sender_name'] == s.name, args.timeout) for s in senders]
+        check(f"{target.name} got signals from every other worker's clients", all(got), f"{sum(got)}/{len(senders)}")
+
+    speaker = participants[0]
+    await speaker.emit('subtitle-text', {'room': room, 'text': 'hello from worker 0'})
+    for p in participants[1:]:
+        ok = await p.wait_for(lambda e, d: e == 'new-subtitles' and any(s['sender_sid'] == speaker.sid for s in d['subtitles']), args.timeout)
+        check(f"{p.name} got new-subtitles from {speaker.name}", ok)
+
+    leaver, dropper = participants[-1], participants[-2]
+    await leaver.emit('leave', {'room': room})
+    await dropper.sio.disconnect()
+    for p in participants[:-2]:
+        left = await p.wait_for(lambda e, d: e == 'user-left' and d['sid'] == leaver.sid, args.timeout)
+        dropped = await p.wait_for(lambda e, d: e == 'user-left' and d['sid'] == dropper.sid, args.timeout)
+        check(f"{p.name} got user-left after leave and disconnect", left and dropped)
+    for p in participants:
+        if p is dropper: continue
+        try: await p.sio.disconnect()
+        except Exception: pass
+    return checks
+
+
+def run_once(redis_url, args):
+    """Starts the workers against redis_url, runs the checks and stops the workers; returns the checks."""
+    env = dict(os.environ, **STUB_ENV, SOCKETIO_MESSAGE_QUEUE=redis_url)
+    workers, urls = [], []
+    try:
+        for i in range(args.workers):
+            port = args.port + i
+            workers.append(subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', args.mode, '--host', '127.0.0.1', '--port', str(port)], cwd=ROOT, env=env))
+            urls.append(f"http://127.0.0.1:{port}")
+        for url in urls: wait_until_up(url)
+        return asyncio.run(run_checks(urls, args))
+    finally:
+        for proc in workers: proc.terminate()
+        for proc in workers: proc.wait()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.redis_url and not args.fakeredis and not shutil.which('redis-server'):
+        print("SKIP: redis-server is not on PATH. Pass --redis-url, install redis-server, or use --fakeredis (failures are then inconclusive).")
+        sys.exit(SKIPPED)
+    fake = args.fakeredis and not args.redis_url
+    attempts = max(1, args.attempts) if fake else 1
+    for attempt in range(1, attempts + 1):
+        redis_proc = None
+        if args.redis_url: redis_url = args.redis_url
+        else: redis_url, redis_proc = start_redis(fake)
+        try: checks = run_once(redis_url, args)
+        finally:
+            if redis_proc: redis_proc.terminate(); redis_proc.wait()
+        failed = [c for c in checks if not c['ok']]
+        print(f"{len(checks) - len(failed)}/{len(checks)} checks passed across {args.workers} workers ({args.mode}), run {attempt}/{attempts}")
+        if not failed: break
+    status = 'passed' if not failed else 'inconclusive' if fake else 'failed'
+    if status == 'inconclusive': print(f"INCONCLUSIVE: checks failed in all {attempts} fakeredis runs; rerun against a real Redis")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': {k: v for k, v in vars(args).items() if k != 'output'}, 'status': status, 'runs': attempt, 'checks': checks}, f, indent=2)
+    if status == 'failed': sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
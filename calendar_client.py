@@ -0,0 +1,152 @@
+"""Google Calendar integration.
+
+Imported lazily by server.py (on first share, or by the background warm-up) so the
+Google client libraries don't slow down worker startup or inflate idle RSS.
+"""
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+
+logger = logging.getLogger('videoapp.calendar')
+
+
+class CalendarUnavailable(RuntimeError):
+    """The Calendar service can't be used (missing or unrefreshable credentials, build failure)."""
+
+
+class CalendarClient:
+    """Process-wide Google Calendar client.
+
+    Credentials are loaded from token_file once and kept in memory; they are
+    refreshed under a lock shortly before they expire, and the token file is only
+    rewritten when the serialized credentials actually change. The discovery-based
+    service is built once and reused. Event inserts are queued and executed by a
+    single worker (the underlying httplib2 transport is not thread-safe); inserts
+    that pile up while the worker is busy are sent as one batch request.
+
+    Pass http (e.g. googleapiclient.http.HttpMock) to build the service against a
+    fake discovery/HTTP layer without credentials or network access. start_task
+    starts the insert worker; insert_latency/batch_latency, if given, are
+    histogram children observing single and batched insert times.
+    """
+    REFRESH_MARGIN = datetime.timedelta(minutes=5)
+    MAX_BATCH = 50 # Google API batch request limit
+
+    def __init__(self, token_file, scopes, start_task, client_secret_file=None, http=None, max_queue=500,
+                 insert_latency=None, batch_latency=None):
+        self.token_file = token_file; self.scopes = scopes; self.client_secret_file = client_secret_file
+        self.http = http; self.start_task = start_task
+        self.insert_latency = insert_latency; self.batch_latency = batch_latency
+        self._lock = threading.Lock()
+        self._creds = None
+        self._saved_token = None
+        self._service = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = None
+
+    def _load_credentials(self):
+        if not os.path.exists(self.token_file):
+            logger.warning("Missing %s. Manual generation or a web OAuth flow is required.", self.token_file)
+            if self.client_secret_file and not os.path.exists(self.client_secret_file):
+                logger.error("%s not found. Cannot authenticate with Google Calendar.", self.client_secret_file)
+            return None
+        try:
+            with open(self.token_file) as token_file_handle: self._saved_token = token_file_handle.read()
+            return Credentials.from_authorized_user_info(json.loads(self._saved_token), self.scopes)
+        except Exception as e:
+            logger.error("Error loading credentials from %s: %s", self.token_file, e)
+            return None
+
+    def _needs_refresh(self, creds):
+        if not creds.valid: return True
+        return creds.expiry is not None and creds.expiry - datetime.datetime.utcnow() < self.REFRESH_MARGIN
+
+    def _save_credentials(self, creds):
+        token = creds.to_json()
+        if token == self._saved_token: return
+        try:
+            with open(self.token_file, 'w') as token_file_handle: token_file_handle.write(token)
+            self._saved_token = token
+            logger.info("Google Calendar token saved to %s", self.token_file)
+        except Exception as e:
+            logger.error("Error writing token to %s: %s", self.token_file, e)
+
+    def _ensure_credentials(self):
+        creds = self._creds
+        if creds is not None and not self._needs_refresh(creds): return creds
+        with self._lock:
+            creds = self._creds or self._load_credentials()
+            if creds is not None and self._needs_refresh(creds):
+                if not creds.refresh_token:
+                    logger.warning("Google Calendar credentials expired and cannot be refreshed. Re-authentication needed.")
+                    return None
+                try:
+                    creds.refresh(Request())
+                    logger.info("Google Calendar token refreshed.")
+                    self._save_credentials(creds)
+                except Exception as e:
+                    logger.error("Error refreshing Google Calendar token: %s. Re-authentication might be needed.", e)
+                    return None
+            self._creds = creds
+            return creds
+
+    def service(self):
+        """Returns the shared Calendar service, or None if credentials are unavailable."""
+        if self.http is None and self._ensure_credentials() is None: return None
+        if self._service is not None: return self._service
+        with self._lock:
+            if self._service is None:
+                try:
+                    if self.http is not None: self._service = build('calendar', 'v3', http=self.http, cache_discovery=False)
+                    else: self._service = build('calendar', 'v3', credentials=self._creds, cache_discovery=False)
+                    logger.info("Google Calendar service built successfully.")
+                except Exception as e:
+                    logger.error("Error building Google Calendar service: %s", e)
+            return self._service
+
+    def insert_event(self, event, on_done):
+        """Queues an event insert; on_done(created_event, error) runs on the worker."""
+        with self._lock:
+            if self._worker is None: self._worker = self.start_task(self._run)
+        try: self._queue.put_nowait((event, on_done))
+        except queue.Full:
+            on_done(None, RuntimeError('Calendar queue is full'))
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < self.MAX_BATCH:
+                try: jobs.append(self._queue.get_nowait())
+                except queue.Empty: break
+            results = {}
+            try:
+                service = self.service()
+                if service is None: raise CalendarUnavailable('Calendar service not available')
+                if len(jobs) == 1:
+                    start = time.perf_counter()
+                    try: results[0] = (service.events().insert(calendarId='primary', body=jobs[0][0], sendUpdates='all').execute(), None)
+                    except Exception as e: results[0] = (None, e)
+                    if self.insert_latency: self.insert_latency.observe(time.perf_counter() - start)
+                else:
+                    def collect(request_id, response, exception): results[int(request_id)] = (response, exception)
+                    batch = service.new_batch_http_request(callback=collect)
+                    for i, (event, _) in enumerate(jobs):
+                        batch.add(service.events().insert(calendarId='primary', body=event, sendUpdates='all'), request_id=str(i))
+                    start = time.perf_counter()
+                    try: batch.execute()
+                    finally:
+                        if self.batch_latency: self.batch_latency.observe(time.perf_counter() - start)
+            except Exception as e:
+                results = {i: results.get(i, (None, e)) for i in range(len(jobs))}
+            for i, (_, on_done) in enumerate(jobs):
+                created_event, error = results.get(i, (None, RuntimeError('No response for batched insert')))
+                try: on_done(created_event, error)
+                except Exception: logger.exception("Calendar completion callback failed")
@@ -0,0 +1,309 @@
+"""Socket.IO load test for the /video namespace.
+
+Starts the app (as a subprocess by default, or in-process) on localhost and drives
+simulated participants with python-socketio's asyncio client (needs aiohttp):
+each one joins a room, sends offer/candidate signal bursts to random peers,
+streams subtitle-text, and churns (explicit leave or abrupt disconnect, then
+rejoin). SMTP, Google Calendar, the SFU and transcripts are disabled, so no
+external services are involved.
+
+    python loadtest.py --clients 500 --room-sizes 2:5,4:3,8:1 --duration 30 --output bench.json
+    python loadtest.py --url http://127.0.0.1:5000 --clients 200    # existing server
+
+The JSON result records the scenario, git commit, event throughput, p50/p99
+latency per event type, dropped signals and server memory growth, so runs can
+be compared across commits. Signals missing from a sender that churned right
+after sending them are reported as client_aborted_signals, not as drops: an
+abrupt disconnect can discard them before they leave the client. Server memory is null with --server inprocess (the
+server shares the load generator's process) and with --url.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+STUB_ENV = {
+    'EMAIL_USER': '', 'PASSWORD': '', 'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': '1', # Mail fails fast locally
+    'INTEGRATION_WARMUP_DELAY': '-1', 'SFU_WORKERS': '0', 'TRANSCRIPTS_DIR': '', 'LOG_LEVEL': 'WARNING',
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the /video Socket.IO namespace.")
+    parser.add_argument('--server', choices=['subprocess', 'inprocess'], default='subprocess')
+    parser.add_argument('--mode', choices=['eventlet', 'gevent', 'threading', 'debug'], default='eventlet',
+                        help="serve.py mode for --server subprocess; debug runs the old socketio.run(app, debug=True) entry point.")
+    parser.add_argument('--url', help="Target an already running server instead of starting one.")
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--room-sizes', default='2:5,4:3,8:1', help="Room size distribution as size:weight pairs.")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds of steady-state traffic.")
+    parser.add_argument('--signal-rate', type=float, default=0.5, help="Signal bursts per client per second.")
+    parser.add_argument('--candidates', type=int, default=4, help="ICE candidates per signal burst.")
+    parser.add_argument('--subtitle-rate', type=float, default=0.5, help="subtitle-text events per client per second.")
+    parser.add_argument('--churn-rate', type=float, default=0.01, help="Probability per client per second of leaving and rejoining.")
+    parser.add_argument('--connect-concurrency', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the JSON result to this file.")
+    return parser.parse_args(argv)
+
+
+def room_plan(clients, room_sizes, rng):
+    """Splits clients into rooms whose sizes follow the size:weight distribution."""
+    sizes, weights = zip(*[(int(s), float(w)) for s, w in (pair.split(':') for pair in room_sizes.split(','))])
+    plan = []
+    remaining = clients
+    while remaining > 0:
+        size = min(rng.choices(sizes, weights)[0], remaining)
+        plan.append(size); remaining -= size
+    return plan
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {} # {event: [seconds, ...]}
+        self.sent = {} # {event: count}
+        self.received = {} # {event: count}
+        self.signals_to = {} # {(sender_sid, target_sid): count sent}
+        self.signals_from_to = {} # {(sender_sid, target_sid): count received}
+        self.departed = set()
+        self.errors = 0
+        self.connect_failures = 0
+
+    def count(self, table, event, n=1): table[event] = table.get(event, 0) + n
+
+    def latency(self, event, seconds): self.latencies.setdefault(event, []).append(seconds)
+
+    def _signal_shortfall(self, sender_departed):
+        return sum(max(0, n - self.signals_from_to.get(pair, 0)) for pair, n in self.signals_to.items()
+                   if pair[1] not in self.departed and (pair[0] in self.departed) == sender_departed)
+
+    def dropped_signals(self):
+        """Signals between two clients that both stayed connected that never arrived."""
+        return self._signal_shortfall(False)
+
+    def client_aborted_signals(self):
+        """Missing signals whose sender churned afterwards; they may never have left its own send queue."""
+        return self._signal_shortfall(True)
+
+    def summary(self, elapsed):
+        def percentiles(values):
+            if not values: return None
+            ordered = sorted(values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+            return {'count': len(values), 'p50_ms': round(pick(0.50), 3), 'p99_ms': round(pick(0.99), 3), 'mean_ms': round(statistics.fmean(values) * 1000, 3)}
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'sent': self.sent, 'received': self.received,
+            'throughput_sent_per_s': round(sum(self.sent.values()) / elapsed, 1),
+            'throughput_received_per_s': round(sum(self.received.values()) / elapsed, 1),
+            'latency': {event: percentiles(values) for event, values in self.latencies.items()},
+            'dropped_signals': self.dropped_signals(),
+            'client_aborted_signals': self.client_aborted_signals(),
+            'errors': self.errors,
+            'connect_failures': self.connect_failures,
+        }
+
+
+class Participant:
+    def __init__(self, url, room_id, name, args, results, rng):
+        self.url = url; self.room_id = room_id; self.name = name; self.args = args
+        self.results = results; self.rng = rng
+        self.peers = set()
+        self.sio = None
+        self.sid = None
+        self._ids = itertools.count()
+
+    async def connect(self):
+        import socketio
+        sio = self.sio = socketio.AsyncClient(reconnection=False)
+        joined = asyncio.Event()
+        results = self.results
+
+        @sio.on('joined-room', namespace='/video')
+        async def on_joined(data):
+            self.sid = data['sid']; results.latency('join', time.perf_counter() - join_started); joined.set()
+
+        @sio.on('other-users', namespace='/video')
+        async def on_other_users(data): self.peers.update(u['sid'] for u in data['users'])
+
+        @sio.on('user-joined', namespace='/video')
+        async def on_user_joined(data): self.peers.add(data['sid']); results.count(results.received, 'user-joined')
+
+        @sio.on('user-left', namespace='/video')
+        async def on_user_left(data): self.peers.discard(data['sid']); results.count(results.received, 'user-left')
+
+        @sio.on('signal', namespace='/video')
+        async def on_signal(data):
+            payload = data.get('payload') or {}
+            results.count(results.received, 'signal')
+            results.count(results.signals_from_to, (data['sender_sid'], self.sid))
+            if 'sent_at' in payload: results.latency('signal', time.perf_counter() - payload['sent_at'])
+
+        @sio.on('new-subtitles', namespace='/video')
+        async def on_subtitles(data):
+            for subtitle in data['subtitles']:
+                if subtitle['sender_sid'] == self.sid: continue
+                results.count(results.received, 'subtitle')
+                sent_at = subtitle['text'].split(' ', 1)[0]
+                try: results.latency('subtitle', time.perf_counter() - float(sent_at))
+                except ValueError: pass
+
+        await asyncio.wait_for(sio.connect(self.url, namespaces=['/video'], transports=['websocket']), 30)
+        join_started = time.perf_counter()
+        await sio.emit('join', {'room': self.room_id, 'name': self.name}, namespace='/video')
+        await asyncio.wait_for(joined.wait(), 30)
+
+    async def signal_burst(self):
+        if not self.peers: return
+        target = self.rng.choice(sorted(self.peers))
+        for kind in ['offer'] + ['candidate'] * self.args.candidates:
+            payload = {'sent_at': time.perf_counter(), 'id': next(self._ids), 'sdp': 'x' * (800 if kind == 'offer' else 120)}
+            await self.sio.emit('signal', {'target_sid': target, 'type': kind, 'payload': payload}, namespace='/video')
+            self.results.count(self.results.sent, 'signal'); self.results.count(self.results.signals_to, (self.sid, target))
+
+    async def subtitle(self):
+        text = f"{time.perf_counter()} the quick brown fox jumps over the lazy dog"
+        await self.sio.emit('subtitle-text', {'room': self.room_id, 'text': text, 'name': self.name}, namespace='/video')
+        self.results.count(self.results.sent, 'subtitle')
+
+    async def churn(self):
+        """Leaves (explicitly or by dropping the connection) and rejoins with a new sid."""
+        self.results.departed.add(self.sid)
+        if self.rng.random() < 0.5:
+            await self.sio.emit('leave', {'room': self.room_id}, namespace='/video')
+            await self.sio.disconnect()
+        else:
+            await self.sio.eio.disconnect(abort=True)
+        self.results.count(self.results.sent, 'churn')
+        self.peers.clear()
+        await self.connect()
+
+    async def run(self, stop_at):
+        tick = 0.1
+        while time.perf_counter() < stop_at:
+            try:
+                if self.rng.random() < self.args.signal_rate * tick: await self.signal_burst()
+                if self.rng.random() < self.args.subtitle_rate * tick: await self.subtitle()
+                if self.rng.random() < self.args.churn_rate * tick: await self.churn()
+            except Exception:
+                self.results.errors += 1
+            await asyncio.sleep(tick)
+
+    async def close(self):
+        try: await self.sio.disconnect()
+        except Exception: pass
+
+
+def rss_mb(pid):
+    """Current RSS of pid (Linux /proc), or None if it can't be read."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'): return round(int(line.split()[1]) / 1024, 1)
+    except OSError: return None
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + '/', timeout=1); return
+        except Exception: time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s")
+
+
+def start_server(args):
+    """Starts the app per args; returns (url, pid or None, stop callable)."""
+    url = f"http://127.0.0.1:{args.port}"
+    here = os.path.dirname(os.path.abspath(__file__))
+    if args.server == 'subprocess':
+        env = dict(os.environ, **STUB_ENV)
+        if args.mode == 'debug': # As server.py's __main__ block runs it, minus the reloader's extra process
+            cmd = [sys.executable, '-c', "import sys, server; server.init_db(); "
+                   "server.socketio.run(server.app, host='127.0.0.1', port=int(sys.argv[1]), debug=True, use_reloader=False, allow_unsafe_werkzeug=True)",
+                   str(args.port)]
+        else:
+            cmd = [sys.executable, os.path.join(here, 'serve.py'), '--mode', args.mode, '--host', '127.0.0.1', '--port', str(args.port)]
+        proc = subprocess.Popen(cmd, cwd=here, env=env)
+        try: wait_until_up(url)
+        except Exception: proc.kill(); proc.wait(); raise
+        return url, proc.pid, lambda: (proc.terminate(), proc.wait())
+    os.environ.update(STUB_ENV, SOCKETIO_ASYNC_MODE='threading')
+    sys.path.insert(0, here)
+    import server
+    server.init_db()
+    threading.Thread(target=server.socketio.run, args=(server.app,), daemon=True,
+                     kwargs={'host': '127.0.0.1', 'port': args.port, 'log_output': False, 'allow_unsafe_werkzeug': True}).start()
+    wait_until_up(url)
+    return url, None, lambda: None
+
+
+def git_commit():
+    try: return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), text=True).strip()
+    except Exception: return None
+
+
+async def run_load(url, args, results):
+    rng = random.Random(args.seed)
+    participants = []
+    for room_index, size in enumerate(room_plan(args.clients, args.room_sizes, rng)):
+        for i in range(size):
+            participants.append(Participant(url, f"LOAD{room_index:05d}", f"Bot{room_index}_{i}", args, results, random.Random(rng.random())))
+    connect_slots = asyncio.Semaphore(args.connect_concurrency)
+    async def connect(p):
+        async with connect_slots:
+            try: await p.connect(); return p
+            except Exception:
+                results.connect_failures += 1
+                await p.close()
+    connect_started = time.perf_counter()
+    participants = [p for p in await asyncio.gather(*(connect(p) for p in participants)) if p]
+    connect_time = time.perf_counter() - connect_started
+    started = time.perf_counter()
+    await asyncio.gather(*(p.run(started + args.duration) for p in participants))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(1.0) # Let in-flight signals and subtitle batches arrive
+    summary = results.summary(elapsed)
+    await asyncio.gather(*(p.close() for p in participants))
+    summary['rooms'] = len({p.room_id for p in participants})
+    summary['connected'] = len(participants)
+    summary['connect_time_s'] = round(connect_time, 3)
+    return summary
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.url: url, pid, stop = args.url.rstrip('/'), None, lambda: None
+    else: url, pid, stop = start_server(args)
+    rss_before = rss_mb(pid) if pid else None # No separate server process to measure in-process or with --url
+    results = Results()
+    try:
+        summary = asyncio.run(run_load(url, args, results))
+        rss_after = rss_mb(pid) if pid else None
+    finally:
+        stop()
+    report = {
+        'scenario': {k: v for k, v in vars(args).items() if k != 'output'},
+        'git_commit': git_commit(),
+        'timestamp': time.time(),
+        'server_rss_mb': {'before': rss_before, 'after': rss_after,
+                          'growth': round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None},
+        **summary,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Outbound email: MIME message building and the background SMTP dispatcher.
+
+Imported lazily by server.py (on first send, or by the background warm-up) so the
+email/smtplib stack is not loaded at worker startup.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+logger = logging.getLogger('videoapp.mail')
+
+
+def build_message(subject, sender, to, text, html):
+    """Returns a multipart/alternative message with plain-text and HTML bodies."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject; msg['From'] = sender; msg['To'] = to
+    msg.attach(MIMEText(text, 'plain'))
+    msg.attach(MIMEText(html, 'html'))
+    return msg
+
+
+class MailDispatcher:
+    """Background outbound mail queue.
+
+    Messages are queued by request/event handlers and drained by a worker thread
+    that keeps one authenticated SMTP connection open between batches, reconnects
+    when the server drops it and retries transient failures (connection errors
+    and 4xx replies) with exponential backoff. Permanent 5xx failures such as a
+    refused recipient or bad credentials fail at once, so one bad address doesn't
+    hold up the rest of the queue. A connection idle for noop_after seconds is
+    checked with NOOP before reuse; back-to-back sends skip the check. Each
+    message may carry an on_done(success, error) callback that is invoked from the
+    worker once delivery finishes. start_task starts the worker; send_latency, if
+    given, is a histogram child observing each SMTP send.
+    """
+    def __init__(self, host, port, username, password, start_task, starttls=True, max_queue=1000,
+                 batch_size=20, max_retries=3, retry_backoff=1.0, idle_timeout=60.0, noop_after=10.0, send_latency=None):
+        self.host = host; self.port = port; self.username = username; self.password = password
+        self.start_task = start_task; self.send_latency = send_latency
+        self.starttls = starttls; self.batch_size = batch_size; self.max_retries = max_retries
+        self.retry_backoff = retry_backoff; self.idle_timeout = idle_timeout; self.noop_after = noop_after
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._server = None
+        self._last_used = 0.0
+
+    def submit(self, msg, recipients, on_done=None):
+        """Queues msg for delivery. Returns False if the queue is full."""
+        self._ensure_worker()
+        try: self._queue.put_nowait((msg, recipients, on_done))
+        except queue.Full:
+            logger.warning("Mail queue full; dropping message to %s.", recipients)
+            return False
+        return True
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = self.start_task(self._run)
+
+    def _connection(self):
+        if self._server is not None:
+            if time.monotonic() - self._last_used < self.noop_after: return self._server
+            try:
+                if self._server.noop()[0] == 250: return self._server
+            except OSError: pass # smtplib.SMTPException is an OSError
+            self._close()
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        try:
+            server.ehlo()
+            if self.starttls: server.starttls(); server.ehlo()
+            if self.username and self.password and server.has_extn('auth'): server.login(self.username, self.password)
+        except Exception:
+            server.close(); raise
+        self._server = server
+        return server
+
+    def _close(self):
+        if self._server is None: return
+        try: self._server.quit()
+        except Exception: pass
+        self._server = None
+
+    def _run(self):
+        while True:
+            try: batch = [self._queue.get(timeout=self.idle_timeout)]
+            except queue.Empty:
+                self._close(); continue # Drop idle connection; reconnect on next message
+            while len(batch) < self.batch_size:
+                try: batch.append(self._queue.get_nowait())
+                except queue.Empty: break
+            for msg, recipients, on_done in batch:
+                error = self._deliver(msg, recipients)
+                if on_done:
+                    try: on_done(error is None, error)
+                    except Exception: logger.exception("Mail completion callback failed")
+
+    def _deliver(self, msg, recipients):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                server = self._connection()
+                start = time.perf_counter()
+                try: server.sendmail(msg['From'], recipients, msg.as_string())
+                finally:
+                    if self.send_latency: self.send_latency.observe(time.perf_counter() - start)
+                self._last_used = time.monotonic()
+                return None
+            except Exception as e:
+                error = e
+                # sendmail() resets the session after a refused sender, recipient or message; keep it open then.
+                if not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)): self._close()
+                if not is_transient(e):
+                    logger.error("Mail to %s failed permanently: %s", recipients, e); return error
+                logger.warning("Mail to %s failed (attempt %s/%s): %s", recipients, attempt + 1, self.max_retries + 1, e)
+                if attempt < self.max_retries: time.sleep(self.retry_backoff * (2 ** attempt))
+        return error
+
+
+def is_transient(error):
+    """Returns whether a failed send is worth retrying: connection problems and 4xx replies are, 5xx replies aren't."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused): return any(code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException): return error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected): return True
+    if isinstance(error, smtplib.SMTPException): return False # E.g. no supported AUTH method or extension
+    return isinstance(error, OSError)
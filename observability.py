@@ -0,0 +1,169 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from functools import wraps
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(label, value, extra=''):
+    if label is None: return '{' + extra + '}' if extra else ''
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + f'{label}="{escaped}"' + (',' + extra if extra else '') + '}'
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1) # Last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock: self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram with one optional label.
+
+    Children are created once per label value (labels() caches them), so observing
+    on the hot path only bisects the bucket bounds and bumps preallocated counts.
+    """
+    def __init__(self, name, help_text, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name; self.help = help_text; self.label = label
+        self.bounds = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value=None):
+        child = self._children.get(value)
+        if child is None:
+            with self._lock: child = self._children.setdefault(value, _HistogramChild(self.bounds))
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, child in list(self._children.items()):
+            with child._lock: counts = list(child._counts); total = child._sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _format_labels(self.label, value, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label, value)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label, value)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label=None):
+        self.name = name; self.help = help_text; self.label = label
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value=None):
+        child = self._children.get(value)
+        if child is None:
+            with self._lock: child = self._children.setdefault(value, _CounterChild())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for value, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.label, value)} {child.value}")
+        return lines
+
+
+class CallbackCounter:
+    """Counter whose value is read from fn() at scrape time, for totals kept elsewhere.
+
+    fn must return a value that only ever increases (until the process restarts).
+    """
+    def __init__(self, name, help_text, fn):
+        self.name = name; self.help = help_text; self.fn = fn
+
+    def render(self):
+        try: value = self.fn()
+        except Exception: return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {value}"]
+
+
+class Gauge:
+    """Gauge whose value is read from fn() at scrape time."""
+    def __init__(self, name, help_text, fn):
+        self.name = name; self.help = help_text; self.fn = fn
+
+    def render(self):
+        try: value = self.fn()
+        except Exception: return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics: lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def timed(child):
+    """Decorator recording a function's wall time on a preallocated histogram child."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try: return f(*args, **kwargs)
+            finally: child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'ts': record.created, 'level': record.levelname, 'logger': record.name, 'message': record.getMessage()}
+        if record.exc_info: entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level='INFO', fmt='text'):
+    """Configures the root logger; fmt is 'text' or 'json' (one JSON object per line).
+
+    Meant for entry points only: it replaces the root logger's handlers. An
+    unknown level falls back to INFO with a warning instead of raising.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    try: root.setLevel(str(level).upper())
+    except ValueError:
+        root.setLevel(logging.INFO)
+        logging.getLogger(__name__).warning("Unknown log level %r; using INFO.", level)
@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VideoRoomRegistry:
+    """In-memory room membership for the /video namespace (single process).
+
+    Keeps per-room occupant maps plus a sid -> (room_id, name) reverse index so
+    that join/leave/signal/disconnect lookups never have to scan every room.
+    """
+    shared = False # State is visible to this process only
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {} # {room_id: {sid: name, ...}}
+        self._by_sid = {} # {sid: (room_id, name)}
+        self._topology = {} # {room_id: 'sfu'}; rooms not listed use full-mesh peers
+
+    def join(self, room_id, sid, name):
+        """Adds sid to room_id. Returns (others, previous) where others is a list of
+        (sid, name) already in the room and previous is the (room_id, name) the sid
+        was moved out of, if any."""
+        with self._lock:
+            previous = self._by_sid.get(sid)
+            if previous and previous[0] != room_id: self._remove(sid)
+            else: previous = None
+            occupants = self._rooms.setdefault(room_id, {})
+            others = [(other_sid, other_name) for other_sid, other_name in occupants.items() if other_sid != sid]
+            occupants[sid] = name
+            self._by_sid[sid] = (room_id, name)
+            return others, previous
+
+    def leave(self, sid, room_id=None):
+        """Removes sid from its room (only if it is room_id, when given).
+        Returns (room_id, name, room_now_empty) or None if sid was not in a room."""
+        with self._lock:
+            entry = self._by_sid.get(sid)
+            if not entry or (room_id is not None and entry[0] != room_id): return None
+            return self._remove(sid)
+
+    def _remove(self, sid):
+        room_id, name = self._by_sid.pop(sid)
+        occupants = self._rooms[room_id]
+        del occupants[sid]
+        if not occupants: del self._rooms[room_id]; self._topology.pop(room_id, None)
+        return room_id, name, not occupants
+
+    def lookup(self, sid):
+        """Returns (room_id, name) for sid, or None."""
+        return self._by_sid.get(sid)
+
+    def name_of(self, sid, room_id=None, default=None):
+        entry = self._by_sid.get(sid)
+        if not entry or (room_id is not None and entry[0] != room_id): return default
+        return entry[1]
+
+    def occupant_count(self, room_id):
+        return len(self._rooms.get(room_id, ()))
+
+    def topology(self, room_id):
+        """Returns 'mesh' or 'sfu' for room_id."""
+        return self._topology.get(room_id, 'mesh')
+
+    def set_topology(self, room_id, topology):
+        with self._lock:
+            if room_id in self._rooms: self._topology[room_id] = topology
+
+    def __len__(self):
+        return len(self._rooms)
+
+_JOIN_SCRIPT = """
+local prefix, room, sid, name, ttl, expires_at = ARGV[1], ARGV[2], ARGV[3], ARGV[4], tonumber(ARGV[5]), ARGV[6]
+local sid_key = prefix .. 'sid:' .. sid
+local prev = redis.call('HMGET', sid_key, 'room', 'name')
+local moved = {}
+if prev[1] and prev[1] ~= room then
+    local prev_key = prefix .. 'room:' .. prev[1]
+    redis.call('HDEL', prev_key, sid)
+    if redis.call('HLEN', prev_key) == 0 then
+        redis.call('ZREM', prefix .. 'active_rooms', prev[1])
+        redis.call('DEL', prefix .. 'topology:' .. prev[1])
+    end
+    moved = {prev[1], prev[2]}
+end
+local room_key = prefix .. 'room:' .. room
+local occupants = redis.call('HGETALL', room_key)
+local others = {}
+for i = 1, #occupants, 2 do
+    if redis.call('EXISTS', prefix .. 'sid:' .. occupants[i]) == 1 then
+        others[#others + 1] = occupants[i]; others[#others + 1] = occupants[i + 1]
+    else
+        redis.call('HDEL', room_key, occupants[i]) -- Expired: its worker stopped refreshing it
+    end
+end
+redis.call('HSET', room_key, sid, name)
+redis.call('EXPIRE', room_key, ttl)
+redis.call('ZADD', prefix .. 'active_rooms', expires_at, room)
+redis.call('HSET', sid_key, 'room', room, 'name', name)
+redis.call('EXPIRE', sid_key, ttl)
+return {others, moved}
+"""
+
+_LEAVE_SCRIPT = """
+local prefix, sid, room = ARGV[1], ARGV[2], ARGV[3]
+local sid_key = prefix .. 'sid:' .. sid
+local entry = redis.call('HMGET', sid_key, 'room', 'name')
+if not entry[1] or (room ~= '' and entry[1] ~= room) then return false end
+redis.call('DEL', sid_key)
+local room_key = prefix .. 'room:' .. entry[1]
+redis.call('HDEL', room_key, sid)
+local remaining = redis.call('HLEN', room_key)
+if remaining == 0 then
+    redis.call('ZREM', prefix .. 'active_rooms', entry[1])
+    redis.call('DEL', prefix .. 'topology:' .. entry[1])
+end
+return {entry[1], entry[2], remaining}
+"""
+
+_SET_TOPOLOGY_SCRIPT = """
+local prefix, room, topology, ttl = ARGV[1], ARGV[2], ARGV[3], tonumber(ARGV[4])
+if redis.call('EXISTS', prefix .. 'room:' .. room) == 0 then return 0 end
+redis.call('SET', prefix .. 'topology:' .. room, topology, 'EX', ttl)
+return 1
+"""
+
+class RedisVideoRoomRegistry:
+    """VideoRoomRegistry backed by Redis, shared by every worker process.
+
+    Rooms are hashes ({prefix}room:<room_id> -> {sid: name}) and each sid has a
+    {prefix}sid:<sid> hash holding its room and name, so lookups stay O(1). Join,
+    leave and set_topology run as Lua scripts so changes are atomic across workers.
+
+    Sid and room keys expire after sid_ttl seconds unless refreshed. Each process
+    refreshes the sids it holds from a background task (started with start_task
+    on the first join), so the sids of a worker that crashed expire on their own
+    and are pruned from their room by the next join instead of being listed in
+    other-users forever.
+    """
+    shared = True # State is visible to every worker process
+
+    def __init__(self, client, prefix='video:', sid_ttl=60.0, start_task=None, sleep=time.sleep):
+        self._redis = client
+        self._prefix = prefix
+        self.sid_ttl = sid_ttl
+        self.start_task = start_task
+        self.sleep = sleep
+        self._join = client.register_script(_JOIN_SCRIPT)
+        self._leave = client.register_script(_LEAVE_SCRIPT)
+        self._set_topology = client.register_script(_SET_TOPOLOGY_SCRIPT)
+        self._lock = threading.Lock()
+        self._local = {} # {sid: room_id} for sids connected to this process
+        self._refresher = None
+
+    def join(self, room_id, sid, name):
+        if self._refresher is None and self.start_task:
+            with self._lock:
+                if self._refresher is None: self._refresher = self.start_task(self._run_refresh)
+        others, moved = self._join(args=[self._prefix, room_id, sid, name, int(self.sid_ttl), time.time() + self.sid_ttl])
+        with self._lock: self._local[sid] = room_id
+        others = [(others[i], others[i + 1]) for i in range(0, len(others), 2) if others[i] != sid]
+        return others, (tuple(moved) if moved else None)
+
+    def leave(self, sid, room_id=None):
+        result = self._leave(args=[self._prefix, sid, room_id or ''])
+        if not result: return None
+        with self._lock: self._local.pop(sid, None)
+        room_id, name, remaining = result
+        return room_id, name, remaining == 0
+
+    def _run_refresh(self):
+        while True:
+            self.sleep(self.sid_ttl / 3)
+            try: self.refresh()
+            except Exception: logger.exception("Refreshing room state TTLs failed")
+
+    def refresh(self):
+        """Extends the expiry of this process's sids and of the rooms they are in."""
+        with self._lock: local = list(self._local.items())
+        if not local: return
+        ttl = int(self.sid_ttl); p = self._prefix
+        pipe = self._redis.pipeline(transaction=False)
+        for sid, _ in local: pipe.expire(f"{p}sid:{sid}", ttl)
+        rooms = {room_id for _, room_id in local}
+        for room_id in rooms: pipe.expire(f"{p}room:{room_id}", ttl); pipe.expire(f"{p}topology:{room_id}", ttl)
+        pipe.zadd(f"{p}active_rooms", {room_id: time.time() + self.sid_ttl for room_id in rooms}, xx=True)
+        pipe.execute()
+
+    def lookup(self, sid):
+        room_id, name = self._redis.hmget(f"{self._prefix}sid:{sid}", 'room', 'name')
+        return (room_id, name) if room_id is not None else None
+
+    def name_of(self, sid, room_id=None, default=None):
+        entry = self.lookup(sid)
+        if not entry or (room_id is not None and entry[0] != room_id): return default
+        return entry[1]
+
+    def occupant_count(self, room_id):
+        return self._redis.hlen(f"{self._prefix}room:{room_id}")
+
+    def topology(self, room_id):
+        return self._redis.get(f"{self._prefix}topology:{room_id}") or 'mesh'
+
+    def set_topology(self, room_id, topology):
+        """Sets the topology of an existing room; does nothing if the room is empty."""
+        self._set_topology(args=[self._prefix, room_id, topology, int(self.sid_ttl)])
+
+    def __len__(self):
+        return self._redis.zcount(f"{self._prefix}active_rooms", time.time(), '+inf')
+
+def create_room_registry(url=None, start_task=None, sleep=time.sleep):
+    """Returns the room registry for url: Redis for redis:// URLs, otherwise in-memory."""
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis # Optional dependency, only needed for multi-process deployments
+        return RedisVideoRoomRegistry(redis.Redis.from_url(url, decode_responses=True), start_task=start_task, sleep=sleep)
+    return VideoRoomRegistry()
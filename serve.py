@@ -0,0 +1,76 @@
+"""Production entry point for the CloudKeeper video server.
+
+    python serve.py --mode eventlet --port 5000
+    python serve.py --mode gevent --workers 4 --port 5000   # ports 5000-5003
+
+eventlet/gevent monkey-patch the standard library before the app is imported,
+so SMTP, Google API and Redis I/O become cooperative; SQLite calls are short and
+run inline. With --workers N, N processes are started on consecutive ports and
+must share state through SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0)
+behind a load balancer with sticky sessions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the CloudKeeper video server.")
+    parser.add_argument('--mode', choices=['eventlet', 'gevent', 'threading'], default='eventlet')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1, help="Processes to start on consecutive ports.")
+    parser.add_argument('--ping-interval', type=float, default=25.0)
+    parser.add_argument('--ping-timeout', type=float, default=20.0)
+    parser.add_argument('--max-http-buffer-size', type=int, default=1000000)
+    parser.add_argument('--max-connections', type=int, default=10000,
+                        help="eventlet only: concurrent connections per process (eventlet's own default is 1024).")
+    return parser.parse_args(argv)
+
+
+def run_workers(args):
+    if not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+        sys.exit("--workers > 1 requires SOCKETIO_MESSAGE_QUEUE to be set (e.g. redis://localhost:6379/0).")
+    procs = []
+    for i in range(args.workers):
+        cmd = [sys.executable, os.path.abspath(__file__), '--mode', args.mode, '--host', args.host,
+               '--port', str(args.port + i), '--ping-interval', str(args.ping_interval),
+               '--ping-timeout', str(args.ping_timeout), '--max-http-buffer-size', str(args.max_http_buffer_size),
+               '--max-connections', str(args.max_connections)]
+        procs.append(subprocess.Popen(cmd))
+    print(f"Started {args.workers} workers on ports {args.port}-{args.port + args.workers - 1}")
+    try:
+        for proc in procs: proc.wait()
+    except KeyboardInterrupt:
+        for proc in procs: proc.terminate()
+        for proc in procs: proc.wait()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1: return run_workers(args)
+
+    if args.mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif args.mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    os.environ['SOCKETIO_ASYNC_MODE'] = args.mode
+    os.environ['SOCKETIO_PING_INTERVAL'] = str(args.ping_interval)
+    os.environ['SOCKETIO_PING_TIMEOUT'] = str(args.ping_timeout)
+    os.environ['SOCKETIO_MAX_HTTP_BUFFER_SIZE'] = str(args.max_http_buffer_size)
+
+    import server # Imported after monkey-patching so its I/O is cooperative
+    server.configure_logging_from_env()
+    server.init_db()
+    server.warm_up_integrations()
+    server.logger.info("Starting Flask-SocketIO server (%s) on http://%s:%s", args.mode, args.host, args.port)
+    extra = {'max_size': args.max_connections} if args.mode == 'eventlet' else {}
+    server.socketio.run(server.app, host=args.host, port=args.port, debug=False, use_reloader=False,
+                        log_output=False, allow_unsafe_werkzeug=args.mode == 'threading', **extra)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,131 +1,226 @@
 import flask
-from flask import Flask, request, redirect, url_for, render_template, session, jsonify, flash
+import importlib.util
+import logging
+from flask import Flask, Response, request, redirect, url_for, render_template, session, jsonify, flash, abort, g
 from flask_cors import CORS
 import os
 import sqlite3
 from functools import wraps
 import random
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+import time
 from dotenv import load_dotenv
-from flask_socketio import SocketIO, emit, join_room, leave_room
-
-# Imports for Google Calendar API
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow # For initial auth if needed
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from flask_socketio import SocketIO, join_room, leave_room
+from user_store import UserStore, VerificationCache
+from room_state import create_room_registry
+from subtitles import SubtitleAggregator
+from transcripts import TranscriptRecorder
+from sfu import SfuPool
+from observability import Registry, Histogram, Counter, CallbackCounter, Gauge, timed, configure_logging
+from assets import AssetPipeline, IMMUTABLE_CACHE_CONTROL, _start_os_thread
+import json
 import datetime # Note: datetime was already imported by Flask implicitly, but good to have explicitly
-import os.path # For checking if token.json exists
 
 load_dotenv()
 
+logger = logging.getLogger('videoapp')
+
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'a_very_secure_default_secret_key_123!PleaseChange')
 CORS(app, supports_credentials=True)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Set SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) to run several worker
+# processes behind a sticky-session load balancer; ROOM_STATE_URL defaults to it.
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+ROOM_STATE_URL = os.getenv('ROOM_STATE_URL', SOCKETIO_MESSAGE_QUEUE)
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE,
+                    async_mode=os.getenv('SOCKETIO_ASYNC_MODE') or None, # threading/eventlet/gevent; auto-detected if unset
+                    ping_interval=float(os.getenv('SOCKETIO_PING_INTERVAL', '25')),
+                    ping_timeout=float(os.getenv('SOCKETIO_PING_TIMEOUT', '20')),
+                    max_http_buffer_size=int(os.getenv('SOCKETIO_MAX_HTTP_BUFFER_SIZE', '1000000')))
+
+# Static files are minified, fingerprinted and precompressed once at startup and served
+# from memory under /assets; templates link them through asset_url(). ASSET_MINIFY=0 keeps sources as is.
+asset_pipeline = AssetPipeline(os.path.join(app.root_path, 'static'), minify=os.getenv('ASSET_MINIFY', '1') == '1',
+                               background=True)
+asset_build_seconds = asset_pipeline.build()
+logger.info("Built %d static assets in %.2fs", len(asset_pipeline.manifest), asset_build_seconds)
+
+@app.context_processor
+def asset_helpers():
+    def asset_url(filename): return asset_pipeline.url(filename) or url_for('static', filename=filename)
+    return {'asset_url': asset_url}
+
+metrics = Registry()
+socket_event_latency = metrics.register(Histogram('videoapp_socket_event_seconds', 'Socket.IO /video handler latency by event.', 'event'))
+http_request_latency = metrics.register(Histogram('videoapp_http_request_seconds', 'Flask route latency by endpoint.', 'endpoint'))
+external_call_latency = metrics.register(Histogram('videoapp_external_call_seconds', 'SMTP and Google Calendar call latency.', 'call'))
+socket_connections = metrics.register(Counter('videoapp_socket_connections_total', 'Socket.IO /video connects and disconnects.', 'event'))
+smtp_send_latency = external_call_latency.labels('smtp_send')
+calendar_insert_latency = external_call_latency.labels('calendar_insert')
+calendar_batch_latency = external_call_latency.labels('calendar_batch')
+connects = socket_connections.labels('connect')
+disconnects = socket_connections.labels('disconnect')
+metrics.register(Gauge('videoapp_connected_sids', 'Socket.IO /video clients connected to this process.', lambda: connects.value - disconnects.value))
+socket_emits = metrics.register(Counter('videoapp_socket_emits_total', 'Socket.IO /video emits by event, one per emit however many clients it reaches.', 'event'))
+emit_counts = {event: socket_emits.labels(event) for event in (
+    'joined-room', 'other-users', 'user-joined', 'user-left', 'left-room-ack', 'error', 'topology-changed', 'signal', 'new-subtitles',
+    'sfu-publish-answer', 'sfu-subscribe-offer', 'sfu-publishers-changed', 'sfu-error', 'share-room-status')}
+room_occupancy = metrics.register(Histogram('videoapp_room_occupancy', 'Video room occupants right after each join.',
+                                            buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64))).labels()
+
+def video_emit(event, data, **kwargs):
+    """socketio.emit on /video, counted in videoapp_socket_emits_total; event must be in emit_counts."""
+    emit_counts[event].inc()
+    socketio.emit(event, data, namespace='/video', **kwargs)
 
 APP_EMAIL_SENDER = os.getenv('EMAIL_USER')
 APP_EMAIL_PASSWORD = os.getenv('PASSWORD')
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', '1') == '1' # Disable for local debugging servers
 DB_PATH = './users.db'
-
-video_rooms = {} # Stores {room_id: {sid: name, ...}}
+user_store = UserStore(DB_PATH)
+verification_cache = VerificationCache(ttl=float(os.getenv('VERIFIED_CACHE_TTL', '300')))
+
+video_rooms = create_room_registry(ROOM_STATE_URL, socketio.start_background_task, socketio.sleep)
+
+# Set TRANSCRIPTS_DIR to record final subtitle lines as per-room meeting transcripts.
+TRANSCRIPTS_DIR = os.getenv('TRANSCRIPTS_DIR')
+transcript_recorder = TranscriptRecorder(TRANSCRIPTS_DIR, socketio.start_background_task, socketio.sleep,
+                                         max_bytes=int(os.getenv('TRANSCRIPT_MAX_BYTES', str(5 * 1024 * 1024)))) if TRANSCRIPTS_DIR else None
+
+def emit_subtitle_batch(room_id, subtitles):
+    senders = {subtitle['sender_sid'] for subtitle in subtitles}
+    skip_sid = next(iter(senders)) if len(senders) == 1 else None # The speaker already shows their own line
+    video_emit('new-subtitles', {'subtitles': subtitles}, room=room_id, skip_sid=skip_sid)
+    if transcript_recorder:
+        for subtitle in subtitles:
+            if not subtitle['partial']: transcript_recorder.record(room_id, subtitle['name'], subtitle['sender_sid'], subtitle['text'])
+
+subtitle_aggregator = SubtitleAggregator(emit_subtitle_batch, socketio.start_background_task, socketio.sleep,
+                                         window=int(os.getenv('SUBTITLE_BATCH_WINDOW_MS', '150')) / 1000,
+                                         max_per_second=float(os.getenv('SUBTITLE_MAX_PER_SECOND', '5')),
+                                         max_chars=int(os.getenv('SUBTITLE_MAX_CHARS', '500')))
+
+# Rooms switch from full-mesh peers to server-side forwarding (SFU) when a joiner asks
+# for it on an empty room or occupancy exceeds SFU_AUTO_THRESHOLD (0 disables). Needs aiortc.
+# SFU workers belong to one process and only see its publishers, so SFU is off when
+# room state is shared between processes (ROOM_STATE_URL set to Redis).
+SFU_WORKERS = int(os.getenv('SFU_WORKERS', '2'))
+SFU_AUTO_THRESHOLD = int(os.getenv('SFU_AUTO_THRESHOLD', '6'))
+sfu_pool = None
+if SFU_WORKERS and importlib.util.find_spec('aiortc'):
+    if video_rooms.shared: logger.warning("SFU forwarding disabled: room state is shared across processes; rooms stay full-mesh.")
+    else: sfu_pool = SfuPool(SFU_WORKERS, socketio.start_background_task, socketio.sleep)
+
+metrics.register(Gauge('videoapp_active_rooms', 'Video rooms with at least one occupant.', lambda: len(video_rooms)))
+metrics.register(CallbackCounter('videoapp_subtitle_lines_received_total', 'Subtitle lines received by this process.', lambda: subtitle_aggregator.received))
+metrics.register(CallbackCounter('videoapp_subtitle_lines_dropped_total', 'Subtitle lines dropped by the per-sender rate limit.', lambda: subtitle_aggregator.dropped))
+metrics.register(CallbackCounter('videoapp_subtitle_batches_sent_total', 'new-subtitles batches emitted by this process.', lambda: subtitle_aggregator.batches))
+metrics.register(CallbackCounter('videoapp_verification_cache_hits_total', 'Verification checks answered without the database.', lambda: verification_cache.hits))
+metrics.register(CallbackCounter('videoapp_verification_cache_misses_total', 'Verification checks that queried the database.', lambda: verification_cache.misses))
+if transcript_recorder: metrics.register(CallbackCounter('videoapp_transcript_lines_dropped_total', 'Transcript lines lost to ring-buffer overflow.', lambda: transcript_recorder.dropped))
 
 # --- Google Calendar API Setup ---
 SCOPES = ['https://www.googleapis.com/auth/calendar.events']
 CLIENT_SECRET_FILE = 'client_secret.json'
 TOKEN_FILE = 'token.json'
 
-def get_calendar_service():
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        try:
-            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-        except Exception as e:
-            print(f"Error loading credentials from {TOKEN_FILE}: {e}")
-            creds = None
-            
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                print("Google Calendar token refreshed.")
-            except Exception as e:
-                print(f"Error refreshing Google Calendar token: {e}. Re-authentication might be needed.")
-                creds = None
-        else:
-            # This part is problematic for a long-running server.
-            # Initial token.json should ideally be generated by a separate script or a proper web OAuth flow.
-            print(f"Missing or invalid {TOKEN_FILE}. Manual generation or a web OAuth flow is required.")
-            if not os.path.exists(CLIENT_SECRET_FILE):
-                print(f"CRITICAL: {CLIENT_SECRET_FILE} not found. Cannot authenticate with Google Calendar.")
-                return None
-            # For a server, you would redirect to flow.authorization_url() and handle the callback.
-            # The InstalledAppFlow is mainly for CLI tools.
-            # flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRET_FILE, SCOPES)
-            # creds = flow.run_local_server(port=0) # This would block and open a browser
-            print("Skipping automatic token generation in server context.")
-            creds = None # Explicitly set to None if auth can't proceed
-
-        if creds and os.path.exists(CLIENT_SECRET_FILE): # Save token if it was created/refreshed
-            try:
-                with open(TOKEN_FILE, 'w') as token_file_handle:
-                    token_file_handle.write(creds.to_json())
-                print(f"Google Calendar token saved to {TOKEN_FILE}")
-            except Exception as e:
-                print(f"Error writing token to {TOKEN_FILE}: {e}")
-    
-    if creds and creds.valid:
-        try:
-            service = build('calendar', 'v3', credentials=creds)
-            print("Google Calendar service built successfully.")
-            return service
-        except Exception as e:
-            print(f"Error building Google Calendar service: {e}")
-            return None
-    else:
-        print("Could not obtain valid credentials for Google Calendar service.")
-        return None
-
 
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute('''CREATE TABLE IF NOT EXISTS users (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            username TEXT UNIQUE NOT NULL,
-                            password TEXT NOT NULL,
-                            otp TEXT,
-                            verified INTEGER DEFAULT 0
-                        )''')
-        conn.commit()
-    print(f"User database initialized at {DB_PATH}")
+    user_store.init_schema()
+    logger.info("User database initialized at %s", DB_PATH)
 
 def is_valid_email(email_address): # Renamed parameter for clarity
     return email_address and email_address.endswith('@cloudkeeper.com')
 
+# The mail and Google Calendar integrations live in mailer.py and calendar_client.py and
+# are imported on first use (or by warm_up_integrations) to keep worker startup fast.
+_integrations_lock = threading.Lock()
+_mail_dispatcher = None
+_calendar_client = None
+
+def get_mail_dispatcher():
+    global _mail_dispatcher
+    if _mail_dispatcher is None:
+        with _integrations_lock:
+            if _mail_dispatcher is None:
+                from mailer import MailDispatcher
+                _mail_dispatcher = MailDispatcher(SMTP_HOST, SMTP_PORT, APP_EMAIL_SENDER, APP_EMAIL_PASSWORD, socketio.start_background_task,
+                                                  starttls=SMTP_STARTTLS, send_latency=smtp_send_latency)
+    return _mail_dispatcher
+
+def get_calendar_client():
+    global _calendar_client
+    if _calendar_client is None:
+        with _integrations_lock:
+            if _calendar_client is None:
+                from calendar_client import CalendarClient
+                _calendar_client = CalendarClient(TOKEN_FILE, SCOPES, socketio.start_background_task, CLIENT_SECRET_FILE,
+                                                  insert_latency=calendar_insert_latency, batch_latency=calendar_batch_latency)
+    return _calendar_client
+
+def build_message(subject, sender, to, text, html):
+    from mailer import build_message
+    return build_message(subject, sender, to, text, html)
+
+def warm_up_integrations(delay=None):
+    """Preloads the mail and calendar modules in the background once the server is up.
+
+    The imports run on an OS thread, since importing the Google API client would
+    otherwise stall the eventlet/gevent hub; the clients are then created on the
+    server's own loop. Set INTEGRATION_WARMUP_DELAY=-1 to disable and load them
+    only on first use.
+    """
+    delay = float(os.getenv('INTEGRATION_WARMUP_DELAY', '2')) if delay is None else delay
+    if delay < 0: return
+    def import_integrations(done):
+        try: importlib.import_module('mailer'); importlib.import_module('calendar_client')
+        finally: done.append(True)
+    def warm_up():
+        socketio.sleep(delay)
+        start = time.perf_counter(); done = []
+        _start_os_thread(import_integrations, done)
+        while not done: socketio.sleep(0.05)
+        get_mail_dispatcher(); get_calendar_client()
+        logger.info("Mail and calendar integrations loaded in %.2fs", time.perf_counter() - start)
+    socketio.start_background_task(warm_up)
+
 def send_otp_email(to_email, otp):
     if not APP_EMAIL_SENDER or not APP_EMAIL_PASSWORD:
-        print("ERROR: Email credentials not configured for OTP.")
+        logger.error("Email credentials not configured for OTP.")
         return False
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = 'CloudKeeper - Your Verification OTP'
-    msg['From'] = f'CloudKeeper Support <{APP_EMAIL_SENDER}>'
-    msg['To'] = to_email
     text = f"Your CloudKeeper OTP is: {otp}\nValid for 10 minutes."
     html = f"""<html><body><p>Your CloudKeeper OTP is: <b>{otp}</b></p><p>Valid for 10 minutes.</p></body></html>"""
-    msg.attach(MIMEText(text, 'plain'))
-    msg.attach(MIMEText(html, 'html'))
-    try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(APP_EMAIL_SENDER, APP_EMAIL_PASSWORD)
-            server.sendmail(msg['From'], [msg['To']], msg.as_string())
-            print(f"OTP email sent to {to_email}.")
-            return True
-    except Exception as e:
-        print(f"Failed to send OTP to {to_email}: {e}")
-        return False
+    msg = build_message('CloudKeeper - Your Verification OTP', f'CloudKeeper Support <{APP_EMAIL_SENDER}>', to_email, text, html)
+    def on_done(success, error):
+        if success: logger.info("OTP email sent to %s.", to_email)
+        else: logger.error("Failed to send OTP to %s: %s", to_email, error)
+    return get_mail_dispatcher().submit(msg, [to_email], on_done)
+
+def session_user_verified():
+    """Returns whether session['username'] is verified, avoiding the database when possible.
+
+    The session carries 'verified_at', the stamp of the last positive check. It is
+    trusted for the cache TTL unless this process has invalidated the user since;
+    otherwise the in-process cache answers, and only a miss queries the database.
+    """
+    username = session['username']
+    entry = verification_cache.get(username)
+    stamp = session.get('verified_at')
+    if entry and entry[0] is not None:
+        verification_cache.record(True)
+        if entry[0] and stamp != entry[1]: session['verified_at'] = entry[1]
+        return entry[0]
+    if stamp and time.time() - stamp < verification_cache.ttl and (entry is None or stamp > entry[1]):
+        verification_cache.record(True)
+        return True
+    verification_cache.record(False)
+    verified = user_store.is_verified(username)
+    stamp = verification_cache.put(username, verified)
+    if verified: session['verified_at'] = stamp
+    else: session.pop('verified_at', None)
+    return verified
 
 def login_required(f):
     @wraps(f)
@@ -133,28 +228,46 @@ def login_required(f):
         if 'username' not in session:
             flash("Please log in to access this page.", "warning")
             return redirect(url_for('welcome'))
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            user = conn.execute("SELECT verified FROM users WHERE username = ?", (session['username'],)).fetchone()
-            if not user or not user['verified']:
-                session.pop('username', None)
-                flash("Account not verified. Please verify or log in again.", "danger")
-                return redirect(url_for('welcome'))
+        if not session_user_verified():
+            session.pop('username', None); session.pop('verified_at', None)
+            flash("Account not verified. Please verify or log in again.", "danger")
+            return redirect(url_for('welcome'))
         return f(*args, **kwargs)
     return decorated_function
 
+@app.before_request
+def start_request_timer(): g.request_start = time.perf_counter()
+
+@app.teardown_request
+def record_request_latency(exc):
+    start = g.pop('request_start', None)
+    if start is not None: http_request_latency.labels(request.endpoint or 'unmatched').observe(time.perf_counter() - start)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    token = os.getenv('METRICS_TOKEN') # When set, scrapers must send "Authorization: Bearer <token>"
+    if token and request.headers.get('Authorization') != f'Bearer {token}': abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    found = asset_pipeline.lookup(filename, request.headers.get('Accept-Encoding', ''))
+    if found is None: abort(404)
+    body, content_type, encoding, etag = found
+    headers = {'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'ETag': etag, 'Vary': 'Accept-Encoding'}
+    if encoding != 'identity': headers['Content-Encoding'] = encoding
+    if request.if_none_match.contains(etag.strip('"')): return Response(status=304, headers=headers)
+    return Response(body, content_type=content_type, headers=headers)
+
 @app.route('/', methods=['GET'])
 def welcome():
     current_year = datetime.datetime.now().year
     if 'username' in session:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            user = conn.execute("SELECT verified FROM users WHERE username = ?", (session['username'],)).fetchone()
-            if user and user['verified']:
-                return redirect(url_for('video_chat_landing_page'))
-            else:
-                session.pop('username', None)
-                flash("Your session was invalid or account is not verified. Please log in.", "warning")
+        if session_user_verified():
+            return redirect(url_for('video_chat_landing_page'))
+        else:
+            session.pop('username', None); session.pop('verified_at', None)
+            flash("Your session was invalid or account is not verified. Please log in.", "warning")
     return render_template('welcome.html', year=current_year)
 
 @app.route('/handle_email', methods=['POST'])
@@ -163,18 +276,14 @@ def handle_email():
     if not is_valid_email(email):
         flash("Invalid email. Must be a @cloudkeeper.com address.", "error")
         return redirect(url_for('welcome'))
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        user = conn.execute("SELECT * FROM users WHERE username = ?", (email,)).fetchone()
+    user = user_store.get_by_username(email)
     if user:
         if user['verified']:
             session['login_email'] = email
             return redirect(url_for('enter_password'))
         else:
             otp = str(random.randint(100000, 999999))
-            with sqlite3.connect(DB_PATH) as conn_update:
-                 conn_update.execute("UPDATE users SET otp = ? WHERE username = ?", (otp, email))
-                 conn_update.commit()
+            user_store.set_otp(email, otp)
             if send_otp_email(email, otp): flash("Account not verified. A new OTP has been sent.", "info")
             else: flash("Account not verified. Failed to send OTP.", "error")
             session['pending_verification_email'] = email
@@ -189,11 +298,10 @@ def enter_password():
     if not email: flash("Session expired. Please start over.", "warning"); return redirect(url_for('welcome'))
     if request.method == 'POST':
         password = request.form.get('password', '')
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            user = conn.execute("SELECT * FROM users WHERE username = ? AND password = ?", (email, password)).fetchone()
+        user = user_store.get_by_credentials(email, password)
         if user and user['verified']:
             session['username'] = user['username']; session.pop('login_email', None)
+            session['verified_at'] = verification_cache.put(user['username'], True)
             flash(f"Welcome back, {user['username']}!", "success"); return redirect(url_for('video_chat_landing_page'))
         elif user and not user['verified']:
             flash("Account not verified. Please verify.", "warning"); session['pending_verification_email'] = email
@@ -211,15 +319,14 @@ def create_account():
         if password != confirm_password: flash("Passwords do not match.", "error"); return render_template('create_account.html', email=email, year=datetime.datetime.now().year)
         otp = str(random.randint(100000, 999999))
         try:
-            with sqlite3.connect(DB_PATH) as conn:
-                conn.execute("INSERT INTO users (username, password, otp, verified) VALUES (?, ?, ?, 0)", (email, password, otp))
-                conn.commit()
+            user_store.create(email, password, otp)
+            verification_cache.invalidate(email)
             if send_otp_email(email, otp):
                 session.pop('signup_email', None); session['pending_verification_email'] = email
                 flash("Account created. Check email for OTP.", "success"); return redirect(url_for('verify_otp_page'))
             else: flash("Account created, but failed to send OTP.", "error"); return render_template('create_account.html', email=email, year=datetime.datetime.now().year)
         except sqlite3.IntegrityError: flash("Email already registered.", "error"); session.pop('signup_email', None); return redirect(url_for('welcome'))
-        except Exception as e: print(f"Create account error: {e}"); flash(f"An unexpected error occurred: {e}", "error"); return render_template('create_account.html', email=email, year=datetime.datetime.now().year)
+        except Exception as e: logger.exception("Create account error"); flash(f"An unexpected error occurred: {e}", "error"); return render_template('create_account.html', email=email, year=datetime.datetime.now().year)
     return render_template('create_account.html', email=email, year=datetime.datetime.now().year)
 
 @app.route('/verify_otp', methods=['GET', 'POST'])
@@ -231,141 +338,253 @@ def verify_otp_page():
         email_to_verify = request.form.get('email_for_verification_fallback', session.get('pending_verification_email', ''))
         if not email_to_verify: flash("Could not determine email for OTP. Start over.", "error"); return redirect(url_for('welcome'))
         if not otp_input: flash("OTP required.", "error"); return render_template('verify.html', email=email_to_verify, year=datetime.datetime.now().year)
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            user = conn.execute("SELECT * FROM users WHERE username = ?", (email_to_verify,)).fetchone()
-            if user and not user['verified'] and user['otp'] == otp_input:
-                conn.execute("UPDATE users SET verified = 1, otp = NULL WHERE username = ?", (email_to_verify,)); conn.commit()
-                session.pop('pending_verification_email', None); flash("Email verified! Please log in.", "success"); return redirect(url_for('welcome'))
-            elif user and user['verified']: session.pop('pending_verification_email', None); flash("Account already verified. Log in.", "info"); return redirect(url_for('welcome'))
-            else: flash("Invalid OTP.", "error"); return render_template('verify.html', email=email_to_verify, year=datetime.datetime.now().year)
+        if user_store.mark_verified(email_to_verify, otp_input):
+            verification_cache.invalidate(email_to_verify)
+            session.pop('pending_verification_email', None); flash("Email verified! Please log in.", "success"); return redirect(url_for('welcome'))
+        elif user_store.is_verified(email_to_verify): session.pop('pending_verification_email', None); flash("Account already verified. Log in.", "info"); return redirect(url_for('welcome'))
+        else: flash("Invalid OTP.", "error"); return render_template('verify.html', email=email_to_verify, year=datetime.datetime.now().year)
     return render_template('verify.html', email=email_for_template, year=datetime.datetime.now().year)
 
 @app.route('/logout')
 def logout(): session.clear(); flash("Logged out.", "info"); return redirect(url_for('welcome'))
 
+@app.route('/cache_stats')
+@login_required
+def cache_stats(): return jsonify({'verification': verification_cache.stats()})
+
+@app.route('/transcripts/<room_id>')
+@login_required
+def room_transcript(room_id):
+    if not transcript_recorder or not transcript_recorder.has_transcript(room_id): abort(404)
+    if not transcript_recorder.is_participant(room_id, session['username']): abort(404) # Same answer as a missing room
+    if request.args.get('format') == 'jsonl':
+        return Response(transcript_recorder.iter_lines(room_id), mimetype='application/x-ndjson')
+    def as_text():
+        for line in transcript_recorder.iter_lines(room_id):
+            entry = json.loads(line)
+            yield f"[{datetime.datetime.utcfromtimestamp(entry['ts']).strftime('%Y-%m-%d %H:%M:%S')}] {entry['name']}: {entry['text']}\n"
+    return Response(as_text(), mimetype='text/plain')
+
 @app.route('/video_chat_landing_page')
 def video_chat_landing_page(): return render_template('video_chat.html')
 
 
 @socketio.on('connect', namespace='/video')
-def video_handle_connect():
-    print(f"Video client connected: {request.sid}")
+@timed(socket_event_latency.labels('connect'))
+def video_handle_connect(auth=None):
+    connects.inc()
+    logger.debug("Video client connected: %s", request.sid)
 
 @socketio.on('disconnect', namespace='/video')
-def video_handle_disconnect():
-    user_sid_leaving = request.sid; room_left = None; user_name_leaving = "Unknown"
-    print(f"Video client disconnecting: {user_sid_leaving}")
-    for room_id, occupants in list(video_rooms.items()):
-        if user_sid_leaving in occupants:
-            user_name_leaving = occupants.pop(user_sid_leaving)
-            room_left = room_id; leave_room(room_id, sid=user_sid_leaving, namespace='/video')
-            print(f"User {user_name_leaving} ({user_sid_leaving}) left video room {room_id}")
-            socketio.emit('user-left', {'sid': user_sid_leaving, 'name': user_name_leaving}, room=room_id, namespace='/video')
-            if not occupants: del video_rooms[room_id]; print(f"Video room {room_id} is empty and removed.")
-            break
-    if not room_left: print(f"User {user_sid_leaving} disconnected; not found in any active room.")
+@timed(socket_event_latency.labels('disconnect'))
+def video_handle_disconnect(reason=None):
+    user_sid_leaving = request.sid
+    disconnects.inc()
+    logger.debug("Video client disconnecting: %s", user_sid_leaving)
+    subtitle_aggregator.forget(user_sid_leaving)
+    entry = video_rooms.lookup(user_sid_leaving) if sfu_pool else None
+    topology = sfu_topology(entry[0] if entry else None) # Read before leave() can drop it with the room
+    left = video_rooms.leave(user_sid_leaving)
+    if not left: logger.debug("User %s disconnected; not found in any active room.", user_sid_leaving); return
+    room_left, user_name_leaving, room_empty = left
+    leave_room(room_left, sid=user_sid_leaving, namespace='/video')
+    logger.info("User %s (%s) left video room %s", user_name_leaving, user_sid_leaving, room_left)
+    video_emit('user-left', {'sid': user_sid_leaving, 'name': user_name_leaving}, room=room_left)
+    sfu_leave(room_left, user_sid_leaving, room_empty, topology)
+    if room_empty: logger.info("Video room %s is empty and removed.", room_left)
 
 @socketio.on('join', namespace='/video')
+@timed(socket_event_latency.labels('join'))
 def video_on_join(data):
     room_id = data.get('room'); user_name = data.get('name', f"Guest_{request.sid[:4]}")
-    if not room_id: emit('error', {'message': 'Room ID is required'}); return
+    if not room_id or not isinstance(room_id, str): video_emit('error', {'message': 'Room ID is required'}, to=request.sid); return
     join_room(room_id, sid=request.sid, namespace='/video')
-    if room_id not in video_rooms: video_rooms[room_id] = {}
-    other_users_info = [{'sid': sid, 'name': name} for sid, name in video_rooms[room_id].items() if sid != request.sid]
-    if other_users_info: emit('other-users', {'users': other_users_info})
-    video_rooms[room_id][request.sid] = user_name
-    socketio.emit('user-joined', {'sid': request.sid, 'name': user_name}, room=room_id, namespace='/video', skip_sid=request.sid)
-    print(f"User {user_name} ({request.sid}) joined room {room_id}. Occupants: {len(video_rooms[room_id])}")
-    emit('joined-room', {'room_id': room_id, 'sid': request.sid})
+    current = video_rooms.lookup(request.sid) if sfu_pool else None
+    previous_topology = sfu_topology(current[0] if current and current[0] != room_id else None)
+    other_users, previous = video_rooms.join(room_id, request.sid, user_name)
+    if transcript_recorder and session.get('username'): transcript_recorder.add_participant(room_id, session['username'])
+    if previous:
+        leave_room(previous[0], sid=request.sid, namespace='/video')
+        video_emit('user-left', {'sid': request.sid, 'name': previous[1]}, room=previous[0])
+        sfu_leave(previous[0], request.sid, False, previous_topology)
+    topology = video_rooms.topology(room_id)
+    if sfu_pool and topology == 'mesh':
+        if (not other_users and data.get('topology') == 'sfu') or (SFU_AUTO_THRESHOLD and len(other_users) + 1 > SFU_AUTO_THRESHOLD):
+            topology = 'sfu'; video_rooms.set_topology(room_id, topology)
+            if other_users: video_emit('topology-changed', {'room_id': room_id, 'topology': topology}, room=room_id, skip_sid=request.sid)
+            logger.info("Video room %s switched to SFU forwarding with %s occupants.", room_id, len(other_users) + 1)
+    room_occupancy.observe(len(other_users) + 1)
+    if other_users: video_emit('other-users', {'users': [{'sid': sid, 'name': name} for sid, name in other_users], 'topology': topology}, to=request.sid)
+    video_emit('user-joined', {'sid': request.sid, 'name': user_name, 'topology': topology}, room=room_id, skip_sid=request.sid)
+    if logger.isEnabledFor(logging.INFO): logger.info("User %s (%s) joined room %s. Occupants: %s", user_name, request.sid, room_id, video_rooms.occupant_count(room_id))
+    video_emit('joined-room', {'room_id': room_id, 'sid': request.sid, 'topology': topology}, to=request.sid)
 
 @socketio.on('signal', namespace='/video')
+@timed(socket_event_latency.labels('signal'))
 def video_on_signal(data):
     target_sid = data.get('target_sid')
-    if not target_sid: print("Signal error: Missing target_sid"); return
-    sender_name = next((occupants[request.sid] for occupants in video_rooms.values() if request.sid in occupants), "Unknown")
+    if not target_sid: logger.warning("Signal error: Missing target_sid"); return
+    sender_name = video_rooms.name_of(request.sid, default="Unknown")
     message_to_send = {'sender_sid': request.sid, 'sender_name': sender_name, 'type': data.get('type'), 'payload': data.get('payload')}
-    socketio.emit('signal', message_to_send, room=target_sid, namespace='/video')
+    video_emit('signal', message_to_send, room=target_sid)
 
 @socketio.on('subtitle-text', namespace='/video')
+@timed(socket_event_latency.labels('subtitle-text'))
 def video_handle_subtitle_text(data):
     room_id = data.get('room'); text = data.get('text'); sender_sid = request.sid
-    user_name = video_rooms.get(room_id, {}).get(sender_sid, data.get('name', f"User_{sender_sid[:4]}"))
-    if room_id and text: socketio.emit('new-subtitle', {'text': text, 'sender_sid': sender_sid, 'name': user_name}, room=room_id, namespace='/video', skip_sid=sender_sid)
+    user_name = video_rooms.name_of(sender_sid, room_id) if room_id and isinstance(room_id, str) else None # The name given on join, never the client's
+    if user_name is None: logger.debug("Ignoring subtitle from %s: not in room %s", sender_sid, room_id); return
+    if isinstance(text, str): subtitle_aggregator.add(room_id, sender_sid, user_name, text, bool(data.get('partial')))
 
 @socketio.on('leave', namespace='/video')
+@timed(socket_event_latency.labels('leave'))
 def video_on_leave(data):
-    room_id = data.get('room'); user_sid_leaving = request.sid; user_name_leaving = "Unknown"
-    if room_id and room_id in video_rooms and user_sid_leaving in video_rooms[room_id]:
-        user_name_leaving = video_rooms[room_id].pop(user_sid_leaving)
+    room_id = data.get('room'); user_sid_leaving = request.sid
+    topology = sfu_topology(room_id)
+    left = video_rooms.leave(user_sid_leaving, room_id) if room_id else None
+    if left:
+        _, user_name_leaving, room_empty = left
         leave_room(room_id, sid=user_sid_leaving, namespace='/video')
-        print(f"User {user_name_leaving} ({user_sid_leaving}) explicitly left room {room_id}")
-        socketio.emit('user-left', {'sid': user_sid_leaving, 'name': user_name_leaving}, room=room_id, namespace='/video')
-        if not video_rooms[room_id]: del video_rooms[room_id]; print(f"Video room {room_id} empty and removed.")
-        emit('left-room-ack', {'room_id': room_id, 'message': 'You have left the room.'})
-    else: print(f"User {user_sid_leaving} tried to explicitly leave room {room_id} but was not found/invalid.")
+        logger.info("User %s (%s) explicitly left room %s", user_name_leaving, user_sid_leaving, room_id)
+        video_emit('user-left', {'sid': user_sid_leaving, 'name': user_name_leaving}, room=room_id)
+        sfu_leave(room_id, user_sid_leaving, room_empty, topology)
+        if room_empty: logger.info("Video room %s empty and removed.", room_id)
+        video_emit('left-room-ack', {'room_id': room_id, 'message': 'You have left the room.'}, to=request.sid)
+    else: logger.debug("User %s tried to explicitly leave room %s but was not found/invalid.", user_sid_leaving, room_id)
+
+def sfu_topology(room_id):
+    """Returns room_id's topology; 'mesh' without a registry lookup when SFU is off."""
+    return video_rooms.topology(room_id) if sfu_pool and room_id else 'mesh'
+
+def sfu_leave(room_id, sid, room_empty, topology):
+    """Drops sid's SFU connections and asks the rest of the room to resubscribe.
+
+    topology is the room's topology from before sid left, since leaving the last
+    seat clears it; mesh rooms never reach the SFU workers.
+    """
+    if topology != 'sfu': return
+    sfu_pool.request(room_id, 'leave', sid=sid)
+    if not room_empty: video_emit('sfu-publishers-changed', {'room_id': room_id}, room=room_id)
+
+def sfu_room_for(data):
+    """Returns the SFU room the requesting sid is in, or None after emitting an error."""
+    room_id = data.get('room')
+    if not sfu_pool or not room_id or video_rooms.name_of(request.sid, room_id) is None or video_rooms.topology(room_id) != 'sfu':
+        video_emit('sfu-error', {'message': 'Not in an SFU room.'}, to=request.sid); return None
+    return room_id
+
+@socketio.on('sfu-publish', namespace='/video')
+@timed(socket_event_latency.labels('sfu-publish'))
+def video_on_sfu_publish(data):
+    room_id = sfu_room_for(data); sid = request.sid
+    if not room_id: return
+    def on_done(answer, error):
+        if error:
+            logger.error("SFU publish for %s in room %s failed: %s", sid, room_id, error)
+            video_emit('sfu-error', {'message': 'Could not publish media.'}, to=sid); return
+        video_emit('sfu-publish-answer', answer, to=sid)
+        video_emit('sfu-publishers-changed', {'room_id': room_id}, room=room_id, skip_sid=sid)
+    sfu_pool.request(room_id, 'publish', on_done, sid=sid, sdp=data.get('sdp'), type=data.get('type'))
+
+@socketio.on('sfu-subscribe', namespace='/video')
+@timed(socket_event_latency.labels('sfu-subscribe'))
+def video_on_sfu_subscribe(data):
+    room_id = sfu_room_for(data); sid = request.sid
+    if not room_id: return
+    def on_done(offer, error):
+        if error:
+            logger.error("SFU subscribe for %s in room %s failed: %s", sid, room_id, error)
+            video_emit('sfu-error', {'message': 'Could not subscribe to room media.'}, to=sid); return
+        for track in offer['tracks']: track['name'] = video_rooms.name_of(track['sid'], room_id, f"User {track['sid'][:6]}")
+        video_emit('sfu-subscribe-offer', offer, to=sid)
+    sfu_pool.request(room_id, 'subscribe', on_done, sid=sid)
+
+@socketio.on('sfu-subscribe-answer', namespace='/video')
+@timed(socket_event_latency.labels('sfu-subscribe-answer'))
+def video_on_sfu_subscribe_answer(data):
+    room_id = sfu_room_for(data); sid = request.sid
+    if not room_id: return
+    def on_done(_, error):
+        if error: logger.error("SFU subscribe answer for %s in room %s failed: %s", sid, room_id, error)
+    sfu_pool.request(room_id, 'subscribe_answer', on_done, sid=sid, sdp=data.get('sdp'), type=data.get('type'))
 
 
 @socketio.on('share-room-by-email', namespace='/video')
+@timed(socket_event_latency.labels('share-room-by-email'))
 def handle_share_room_by_email(data):
-    recipient_email = data.get('recipient_email')
+    recipient_emails = [e.strip() for e in (data.get('recipient_email') or '').split(',') if e.strip()]
     room_id = data.get('room_id')
     join_link = data.get('join_link')
     sharer_name = data.get('sharer_name', 'A colleague')
     sharer_email = session.get('username', APP_EMAIL_SENDER)
 
-    if not all([recipient_email, room_id, join_link]):
-        emit('share-room-status', {'success': False, 'message': 'Missing required share information.'})
+    if not all([recipient_emails, room_id, join_link]):
+        video_emit('share-room-status', {'success': False, 'message': 'Missing required share information.'}, to=request.sid)
         return
 
     subject = f"Invitation to CloudKeeper Video Meeting: Room {room_id}"
     body_text = f"Hello,\n\n{sharer_name} has invited you to a CloudKeeper video meeting.\n\nRoom ID: {room_id}\nJoin Link: {join_link}\n\nBest regards,\nThe CloudKeeper Team (via {sharer_name})"
     body_html = f"<html><body><p>Hello,</p><p>{sharer_name} has invited you to a CloudKeeper video meeting.</p><p><strong>Room ID:</strong> {room_id}</p><p><strong>Join Link:</strong> <a href=\"{join_link}\">{join_link}</a></p><p>Best regards,<br>The CloudKeeper Team (via {sharer_name})</p></body></html>"
-    msg = MIMEMultipart('alternative'); msg['Subject'] = subject; msg['From'] = f'CloudKeeper Invitations <{APP_EMAIL_SENDER}>'; msg['To'] = recipient_email
-    msg.attach(MIMEText(body_text, 'plain')); msg.attach(MIMEText(body_html, 'html'))
-
-    email_sent_successfully = False
-    try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls(); server.login(APP_EMAIL_SENDER, APP_EMAIL_PASSWORD)
-            server.sendmail(msg['From'], [recipient_email], msg.as_string())
-        print(f"Invitation email sent to {recipient_email} for room {room_id}.")
-        email_sent_successfully = True
-    except Exception as e:
-        print(f"Failed to send invitation email to {recipient_email}: {e}")
-        emit('share-room-status', {'success': False, 'message': f'Failed to send email: An error occurred.'})
-        return
 
-    if not email_sent_successfully: return
-
-    calendar_service = get_calendar_service()
-    if calendar_service:
-        now = datetime.datetime.utcnow(); start_time = now.isoformat() + 'Z'; end_time = (now + datetime.timedelta(hours=1)).isoformat() + 'Z'
-        event_summary = f'CloudKeeper Meeting - Room: {room_id}'
-        event_description = f'Join the CloudKeeper video meeting.\nRoom ID: {room_id}\nJoin Link: {join_link}'
-        event_attendees = [{'email': recipient_email}]
-        if sharer_email and sharer_email != APP_EMAIL_SENDER : # Add sharer if they are a logged-in user (not the app's default sender)
-            event_attendees.append({'email': sharer_email})
-        
-        event = {
-            'summary': event_summary, 'location': f'CloudKeeper Video Call - Room {room_id}', 'description': event_description,
-            'start': {'dateTime': start_time, 'timeZone': 'UTC'}, 'end': {'dateTime': end_time, 'timeZone': 'UTC'},
-            'attendees': event_attendees,
-            'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 10}]}
-        }
-        try:
-            created_event = calendar_service.events().insert(calendarId='primary', body=event, sendUpdates='all').execute()
-            print(f"Calendar event created: {created_event.get('htmlLink')}")
-            emit('share-room-status', {'success': True, 'message': 'Invitation sent & calendar event created!'})
-        except Exception as e:
-            print(f"Error creating calendar event: {e}")
-            emit('share-room-status', {'success': True, 'message': f'Email sent, but failed to create calendar event: {e}'})
-    else:
-        print("Calendar service not available. Skipping event creation.")
-        emit('share-room-status', {'success': True, 'message': 'Invitation email sent. Calendar event skipped (auth/service issue).'})
+    sid = request.sid
+    pending = {'remaining': len(recipient_emails), 'delivered': []}
+    pending_lock = threading.Lock()
+    def send_status(status): video_emit('share-room-status', status, to=sid)
+    def on_email_done(recipient_email, success, error):
+        if success: logger.info("Invitation email sent to %s for room %s.", recipient_email, room_id)
+        else: logger.error("Failed to send invitation email to %s: %s", recipient_email, error)
+        with pending_lock:
+            if success: pending['delivered'].append(recipient_email)
+            pending['remaining'] -= 1
+            if pending['remaining']: return
+        if not pending['delivered']:
+            send_status({'success': False, 'message': 'Failed to send email: An error occurred.'}); return
+        create_share_calendar_event(room_id, join_link, pending['delivered'], sharer_email, send_status)
+
+    for recipient_email in recipient_emails:
+        msg = build_message(subject, f'CloudKeeper Invitations <{APP_EMAIL_SENDER}>', recipient_email, body_text, body_html)
+        if not get_mail_dispatcher().submit(msg, [recipient_email], lambda success, error, r=recipient_email: on_email_done(r, success, error)):
+            on_email_done(recipient_email, False, 'mail queue is full')
+
+def create_share_calendar_event(room_id, join_link, recipient_emails, sharer_email, on_done):
+    """Queues the calendar event for a room share; on_done receives the share-room-status payload."""
+    now = datetime.datetime.utcnow(); start_time = now.isoformat() + 'Z'; end_time = (now + datetime.timedelta(hours=1)).isoformat() + 'Z'
+    event_summary = f'CloudKeeper Meeting - Room: {room_id}'
+    event_description = f'Join the CloudKeeper video meeting.\nRoom ID: {room_id}\nJoin Link: {join_link}'
+    event_attendees = [{'email': email} for email in recipient_emails]
+    if sharer_email and sharer_email != APP_EMAIL_SENDER : # Add sharer if they are a logged-in user (not the app's default sender)
+        event_attendees.append({'email': sharer_email})
+    
+    event = {
+        'summary': event_summary, 'location': f'CloudKeeper Video Call - Room {room_id}', 'description': event_description,
+        'start': {'dateTime': start_time, 'timeZone': 'UTC'}, 'end': {'dateTime': end_time, 'timeZone': 'UTC'},
+        'attendees': event_attendees,
+        'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 10}]}
+    }
+    def on_event_done(created_event, error):
+        from calendar_client import CalendarUnavailable # Already loaded by get_calendar_client()
+        if created_event:
+            logger.info("Calendar event created: %s", created_event.get('htmlLink'))
+            on_done({'success': True, 'message': 'Invitation sent & calendar event created!'})
+        elif isinstance(error, CalendarUnavailable):
+            logger.warning("Calendar service not available. Skipping event creation. (%s)", error)
+            on_done({'success': True, 'message': 'Invitation email sent. Calendar event skipped (auth/service issue).'})
+        else:
+            logger.error("Error creating calendar event: %s", error)
+            on_done({'success': True, 'message': f'Email sent, but failed to create calendar event: {error}'})
+    get_calendar_client().insert_event(event, on_event_done)
+
+
+def configure_logging_from_env():
+    """Sets up logging from LOG_LEVEL and LOG_FORMAT; called by the entry points, not on import.
 
+    LOG_LEVEL=WARNING silences the per-join/leave INFO lines; per-signal logging is DEBUG only.
+    """
+    configure_logging(os.getenv('LOG_LEVEL', 'INFO'), os.getenv('LOG_FORMAT', 'text'))
 
 if __name__ == '__main__':
+    configure_logging_from_env()
     init_db()
-    print("Starting Flask-SocketIO server on http://localhost:5000")
+    warm_up_integrations()
+    logger.info("Starting Flask-SocketIO development server on http://localhost:5000 (use serve.py in production)")
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""Selective forwarding unit (SFU) for large /video rooms.
+
+In SFU rooms each client sends its camera/mic once to the server ("publish") and
+receives everyone else's tracks over a single second connection ("subscribe"),
+instead of holding one RTCPeerConnection per participant. Media is handled by
+aiortc in a pool of worker processes; all peers of a room live in the same worker
+(chosen by hashing the room id) so tracks can be relayed in-process.
+
+The web process talks to the workers over multiprocessing pipes. Requests are
+fire-and-forget with a completion callback, which is invoked from a reader task
+once the worker replies. A worker's reader task only runs while requests to it
+are outstanding, so an idle pool costs nothing. If a worker dies, its pending
+callbacks get an error and a fresh worker takes its place; the rooms it held
+have to publish again.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+class SfuPool:
+    def __init__(self, workers, start_task, sleep, poll_interval=0.01):
+        self.workers = workers
+        self.start_task = start_task
+        self.sleep = sleep
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = {} # {request_id: (slot, on_done)}
+        self._conns = None # [(conn, send_lock)] per worker slot
+        self._outstanding = [0] * workers # Requests awaiting a reply, per slot
+        self._reading = [False] * workers # Whether a reader task is running, per slot
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._conns is not None: return
+            self._conns = [None] * self.workers
+            for slot in range(self.workers): self._spawn(slot)
+
+    def _spawn(self, slot):
+        ctx = multiprocessing.get_context('spawn') # Don't fork eventlet/gevent-patched state
+        parent_conn, child_conn = ctx.Pipe()
+        ctx.Process(target=_worker_main, args=(child_conn,), daemon=True).start()
+        child_conn.close()
+        self._conns[slot] = (parent_conn, threading.Lock())
+
+    def request(self, room_id, command, on_done=None, **kwargs):
+        """Sends command for room_id to the room's worker; on_done(result, error) runs on reply."""
+        self._ensure_started()
+        slot = zlib.crc32(room_id.encode()) % self.workers
+        request_id = next(self._ids)
+        with self._lock:
+            conn, send_lock = self._conns[slot]
+            self._pending[request_id] = (slot, on_done)
+            self._outstanding[slot] += 1
+            start_reader = not self._reading[slot]
+            self._reading[slot] = True
+        try:
+            with send_lock: conn.send((request_id, command, room_id, kwargs))
+        except (OSError, EOFError) as e: # BrokenPipeError once the worker has died
+            logger.error("SFU worker %d is gone (%s); restarting it", slot, e)
+            self._worker_lost(slot, conn); return
+        if start_reader: self.start_task(self._read_replies, slot, conn)
+
+    def _read_replies(self, slot, conn):
+        while True:
+            with self._lock:
+                if self._conns[slot][0] is not conn: return # Worker was replaced
+                if not self._outstanding[slot]: self._reading[slot] = False; return
+            try:
+                if not conn.poll(): self.sleep(self.poll_interval); continue
+                request_id, result, error = conn.recv()
+            except (OSError, EOFError):
+                logger.error("SFU worker %d exited; restarting it", slot)
+                self._worker_lost(slot, conn); return
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+                if entry: self._outstanding[slot] -= 1
+            if entry and entry[1]: self._complete(entry[1], result, error)
+
+    def _worker_lost(self, slot, conn):
+        """Replaces the worker behind conn and fails the requests it still owed replies for."""
+        with self._lock:
+            if self._conns[slot][0] is not conn: return # Already replaced
+            lost = [request_id for request_id, (s, _) in self._pending.items() if s == slot]
+            callbacks = [self._pending.pop(request_id)[1] for request_id in lost]
+            self._outstanding[slot] = 0; self._reading[slot] = False
+            conn.close()
+            self._spawn(slot)
+        for on_done in callbacks:
+            if on_done: self._complete(on_done, None, 'SFU worker exited')
+
+    def _complete(self, on_done, result, error):
+        try: on_done(result, error)
+        except Exception: logger.exception("SFU completion callback failed")
+
+
+class _Room:
+    def __init__(self, relay):
+        self.relay = relay
+        self.publishers = {} # {sid: (pc, [track, ...])}
+        self.subscribers = {} # {sid: pc}
+
+
+class _Worker:
+    def __init__(self):
+        from aiortc.contrib.media import MediaRelay
+        self._relay_class = MediaRelay
+        self.rooms = {}
+
+    def _room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None: room = self.rooms[room_id] = _Room(self._relay_class())
+        return room
+
+    async def publish(self, room_id, sid, sdp, type):
+        """Accepts a client's upstream offer; returns the answer."""
+        from aiortc import RTCPeerConnection, RTCSessionDescription
+        room = self._room(room_id)
+        await self._close_publisher(room, sid)
+        pc = RTCPeerConnection()
+        tracks = []
+        room.publishers[sid] = (pc, tracks)
+        pc.on('track', tracks.append)
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=type))
+        await pc.setLocalDescription(await pc.createAnswer())
+        return {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}
+
+    async def subscribe(self, room_id, sid):
+        """Creates a downstream connection carrying every other publisher's tracks; returns the offer."""
+        from aiortc import RTCPeerConnection
+        room = self._room(room_id)
+        old = room.subscribers.pop(sid, None)
+        if old: await old.close()
+        pc = RTCPeerConnection()
+        room.subscribers[sid] = pc
+        sources = []
+        for publisher_sid, (_, tracks) in room.publishers.items():
+            if publisher_sid == sid: continue
+            for track in tracks:
+                sources.append((pc.addTransceiver(room.relay.subscribe(track), direction='sendonly'), publisher_sid))
+        await pc.setLocalDescription(await pc.createOffer())
+        return {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type,
+                'tracks': [{'mid': transceiver.mid, 'sid': publisher_sid} for transceiver, publisher_sid in sources]}
+
+    async def subscribe_answer(self, room_id, sid, sdp, type):
+        from aiortc import RTCSessionDescription
+        pc = self._room(room_id).subscribers.get(sid)
+        if pc: await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=type))
+
+    async def leave(self, room_id, sid):
+        room = self.rooms.get(room_id)
+        if room is None: return
+        await self._close_publisher(room, sid)
+        pc = room.subscribers.pop(sid, None)
+        if pc: await pc.close()
+        if not room.publishers and not room.subscribers: del self.rooms[room_id]
+
+    async def _close_publisher(self, room, sid):
+        entry = room.publishers.pop(sid, None)
+        if entry: await entry[0].close()
+
+    async def stats(self, room_id=None):
+        return {'rooms': len(self.rooms),
+                'publishers': sum(len(r.publishers) for r in self.rooms.values()),
+                'subscribers': sum(len(r.subscribers) for r in self.rooms.values())}
+
+
+def _worker_main(conn):
+    """Entry point of an SFU worker process: runs aiortc on an asyncio loop."""
+    async def main():
+        loop = asyncio.get_running_loop()
+        worker = _Worker()
+        async def handle(request_id, command, room_id, kwargs):
+            try: reply = (request_id, await getattr(worker, command)(room_id, **kwargs), None)
+            except Exception as e: reply = (request_id, None, f"{type(e).__name__}: {e}")
+            conn.send(reply)
+        while True:
+            try: request_id, command, room_id, kwargs = await loop.run_in_executor(None, conn.recv)
+            except EOFError: return
+            loop.create_task(handle(request_id, command, room_id, kwargs))
+    asyncio.run(main())
@@ -37,6 +37,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let localStream, screenStream, originalVideoTrack;
     let currentRoomId = null, mySid = null, localUserName = "Guest";
     const peerConnections = {};
+    let topology = 'mesh', publishPc = null, subscribePc = null; // topology is 'mesh' or 'sfu'
 
     let speechRecognition, isRecognizing = false, subtitlesDisplay;
     let speechRecognitionRetries = 0; const MAX_SPEECH_RETRIES = 2;
@@ -47,7 +48,20 @@ document.addEventListener('DOMContentLoaded', () => {
     function logMessage(message) { console.log(message); if (messagesLog) { const p = document.createElement('p'); p.textContent = message; messagesLog.appendChild(p); messagesLog.scrollTop = messagesLog.scrollHeight; } }
     function generateRoomId() { return Math.random().toString(36).substring(2, 8).toUpperCase(); }
     function setupSubtitlesDisplayArea() { subtitlesDisplay = document.getElementById('subtitles-output'); if (!subtitlesDisplay) console.error("Subtitle display area 'subtitles-output' not found!"); }
-    function displayUserSubtitle(text, senderDisplayName, isLocal = false) { if (!subtitlesDisplay) return; const p = document.createElement('p'); p.style.fontWeight = isLocal ? 'bold' : 'normal'; p.innerHTML = `<strong>${senderDisplayName}:</strong> ${text}`; subtitlesDisplay.appendChild(p); subtitlesDisplay.scrollTop = subtitlesDisplay.scrollHeight; setTimeout(() => { if (p.parentNode === subtitlesDisplay) subtitlesDisplay.removeChild(p); }, 20000); }
+    // Interim (partial) recognition results are sent at most every PARTIAL_SUBTITLE_INTERVAL_MS and shown
+    // in place: each sender has one live line that later partials overwrite and the final result settles.
+    const PARTIAL_SUBTITLE_INTERVAL_MS = 300; let lastPartialSubtitleAt = 0;
+    const liveSubtitles = {}; // {sender sid: <p> holding that sender's in-progress line}
+    function displayUserSubtitle(text, senderDisplayName, isLocal = false, partial = false, senderSid = mySid) {
+        if (!subtitlesDisplay) return;
+        let p = liveSubtitles[senderSid];
+        if (!p) { p = document.createElement('p'); p.style.fontWeight = isLocal ? 'bold' : 'normal'; subtitlesDisplay.appendChild(p); }
+        p.innerHTML = `<strong>${senderDisplayName}:</strong> ${text}`; p.style.opacity = partial ? '0.6' : '1';
+        if (partial) liveSubtitles[senderSid] = p; else delete liveSubtitles[senderSid];
+        subtitlesDisplay.scrollTop = subtitlesDisplay.scrollHeight;
+        clearTimeout(p.expireTimer);
+        p.expireTimer = setTimeout(() => { if (liveSubtitles[senderSid] === p) delete liveSubtitles[senderSid]; if (p.parentNode === subtitlesDisplay) subtitlesDisplay.removeChild(p); }, 20000);
+    }
 
     function initializeUserName() {
         if (typeof sessionUsername !== 'undefined' && sessionUsername) {
@@ -105,7 +119,16 @@ document.addEventListener('DOMContentLoaded', () => {
             updateButtonStates();
         };
         speechRecognition.onend = () => { const wasRec = isRecognizing; isRecognizing = false; if (isCcOn && speechRecognition && wasRec && !['not-allowed', 'service-not-allowed', 'aborted'].includes(speechRecognition.error) && speechRecognitionRetries < MAX_SPEECH_RETRIES) { try { setTimeout(() => { if (isCcOn) speechRecognition.start(); }, 500); } catch(e){ console.error("SR onend restart error:", e); isCcOn = false; updateButtonStates(); } } else updateButtonStates(); };
-        speechRecognition.onresult = (event) => { let finalTranscript = ''; for (let i = event.resultIndex; i < event.results.length; ++i) if (event.results[i].isFinal) finalTranscript += event.results[i][0].transcript; if (finalTranscript.trim() && currentRoomId && mySid) { socket.emit('subtitle-text', { text: finalTranscript, sender_sid: mySid, room: currentRoomId, name: localUserName }); displayUserSubtitle(finalTranscript.trim(), localUserName, true); } };
+        speechRecognition.onresult = (event) => {
+            let finalTranscript = '', interimTranscript = '';
+            for (let i = event.resultIndex; i < event.results.length; ++i) { if (event.results[i].isFinal) finalTranscript += event.results[i][0].transcript; else interimTranscript += event.results[i][0].transcript; }
+            if (!currentRoomId || !mySid) return;
+            if (finalTranscript.trim()) { socket.emit('subtitle-text', { text: finalTranscript, sender_sid: mySid, room: currentRoomId, name: localUserName, partial: false }); displayUserSubtitle(finalTranscript.trim(), localUserName, true); lastPartialSubtitleAt = 0; }
+            else if (interimTranscript.trim()) {
+                displayUserSubtitle(interimTranscript.trim(), localUserName, true, true);
+                if (Date.now() - lastPartialSubtitleAt >= PARTIAL_SUBTITLE_INTERVAL_MS) { lastPartialSubtitleAt = Date.now(); socket.emit('subtitle-text', { text: interimTranscript, sender_sid: mySid, room: currentRoomId, name: localUserName, partial: true }); }
+            }
+        };
         if (toggleCcButton) { toggleCcButton.disabled = false; toggleCcButton.addEventListener('click', handleToggleCc); }
         updateButtonStates();
     }
@@ -166,7 +189,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!triggeredByTrackEnd) updateButtonStates();
     }
 
-    function updateAllPeerConnectionsWithNewTrack(newTrack, streamForTrack, kind = 'video') { for (const sid in peerConnections) { const pc = peerConnections[sid]; const sender = pc.getSenders().find(s => s.track && s.track.kind === kind); if (sender) sender.replaceTrack(newTrack).catch(e => console.error(`Error replacing ${kind} track for ${sid}:`, e)); else if (newTrack && streamForTrack) try { pc.addTrack(newTrack, streamForTrack); } catch (e) { console.error(`Error adding ${kind} track for ${sid}:`, e); } } }
+    function updateAllPeerConnectionsWithNewTrack(newTrack, streamForTrack, kind = 'video') { const targets = Object.assign({}, peerConnections); if (publishPc) targets['sfu-publish'] = publishPc; for (const sid in targets) { const pc = targets[sid]; const sender = pc.getSenders().find(s => s.track && s.track.kind === kind); if (sender) sender.replaceTrack(newTrack).catch(e => console.error(`Error replacing ${kind} track for ${sid}:`, e)); else if (newTrack && streamForTrack) try { pc.addTrack(newTrack, streamForTrack); } catch (e) { console.error(`Error adding ${kind} track for ${sid}:`, e); } } }
 
     function updateButtonStates() {
         if(toggleCameraButton) { toggleCameraButton.innerHTML = isCameraOn ? '📷' : '🚫📷'; toggleCameraButton.title = isCameraOn ? "Turn Camera Off" : "Turn Camera On"; toggleCameraButton.classList.toggle('toggled-off', !isCameraOn); toggleCameraButton.classList.remove('toggled-on'); toggleCameraButton.disabled = isScreenSharing; }
@@ -183,10 +206,11 @@ document.addEventListener('DOMContentLoaded', () => {
         else if (currentRoomId === roomIdToJoin) { logMessage(`Already in room ${currentRoomId}.`); return; }
         currentRoomId = roomIdToJoin;
         console.log(`[DEBUG] Emitting 'join' for room ${currentRoomId} with name: ${localUserName}`);
-        socket.emit('join', { room: currentRoomId, name: localUserName });
+        const requestedTopology = new URLSearchParams(window.location.search).get('topology'); // ?topology=sfu opts a new room into server forwarding
+        socket.emit('join', { room: currentRoomId, name: localUserName, topology: requestedTopology || undefined });
         logMessage(`Attempting to join room: ${currentRoomId} as ${localUserName}`);
     }
-    function cleanUpPeerConnections() { for (const sid in peerConnections) { if (peerConnections[sid]) peerConnections[sid].close(); const remoteVideoWrapper = document.getElementById(`video-wrapper-${sid}`); if (remoteVideoWrapper) remoteVideoWrapper.remove(); } Object.keys(peerConnections).forEach(key => delete peerConnections[key]); }
+    function cleanUpPeerConnections() { closeMeshPeerConnections(); if (publishPc) { publishPc.close(); publishPc = null; } if (subscribePc) { subscribePc.close(); subscribePc = null; } document.querySelectorAll('#videos-container [id^="video-wrapper-"]').forEach(w => w.remove()); topology = 'mesh'; }
 
     function updateUIAfterJoin(roomIdJoined) {
         if(displayRoomId) displayRoomId.textContent = roomIdJoined;
@@ -218,7 +242,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if(roomIdInput) roomIdInput.style.display = 'inline-block'; if(roomIdInput) roomIdInput.value = '';
         const orSpan = document.querySelector('.main-controls span'); if(orSpan) orSpan.style.display = 'inline';
         if(messagesLog) messagesLog.innerHTML = '';
-        if(subtitlesDisplay) subtitlesDisplay.innerHTML = '';
+        if(subtitlesDisplay) subtitlesDisplay.innerHTML = ''; Object.keys(liveSubtitles).forEach(sid => delete liveSubtitles[sid]);
         isCameraOn = true; isMicOn = true; updateButtonStates();
         if(createRoomBtn) createRoomBtn.disabled = true; if(joinRoomBtn) joinRoomBtn.disabled = true;
         logMessage("Left room. Ready to join/create."); localUserName = "Guest";
@@ -229,13 +253,13 @@ document.addEventListener('DOMContentLoaded', () => {
     socket.on('connect', () => { mySid = socket.id; logMessage('Connected.'); initializeUserName(); updateButtonStates(); });
     socket.on('disconnect', () => { logMessage('Disconnected.'); if (currentRoomId) resetUIAndStateAfterLeave(); });
     socket.on('my-sid', (data) => { mySid = data.sid; logMessage(`SID: ${mySid ? mySid.substring(0,6) : 'N/A'}`);});
-    socket.on('joined-room', (data) => { mySid = data.sid; currentRoomId = data.room_id; logMessage(`Joined: ${data.room_id}. SID: ${data.sid ? data.sid.substring(0,6) : 'N/A'}`); updateUIAfterJoin(data.room_id); });
-    socket.on('other-users', (data) => { console.log("[DEBUG] 'other-users' received:", JSON.stringify(data)); if (!localStream && !screenStream) return; data.users.forEach(ud => { if (ud.sid !== mySid) createPeerConnection(ud.sid, true, ud.name || `User ${ud.sid.substring(0,6)}`); }); });
-    socket.on('user-joined', (data) => { const {sid, name} = data; console.log("[DEBUG] 'user-joined' received:", JSON.stringify(data)); if (sid === mySid || (!localStream && !screenStream)) return; logMessage(`User ${name || sid.substring(0,6)} joined.`); createPeerConnection(sid, false, name || `User ${sid.substring(0,6)}`); });
+    socket.on('joined-room', (data) => { mySid = data.sid; currentRoomId = data.room_id; logMessage(`Joined: ${data.room_id}. SID: ${data.sid ? data.sid.substring(0,6) : 'N/A'}`); updateUIAfterJoin(data.room_id); if (data.topology === 'sfu') startSfu(); });
+    socket.on('other-users', (data) => { console.log("[DEBUG] 'other-users' received:", JSON.stringify(data)); if ((!localStream && !screenStream) || data.topology === 'sfu') return; data.users.forEach(ud => { if (ud.sid !== mySid) createPeerConnection(ud.sid, true, ud.name || `User ${ud.sid.substring(0,6)}`); }); });
+    socket.on('user-joined', (data) => { const {sid, name} = data; console.log("[DEBUG] 'user-joined' received:", JSON.stringify(data)); if (sid === mySid || (!localStream && !screenStream)) return; logMessage(`User ${name || sid.substring(0,6)} joined.`); if (topology === 'sfu' || data.topology === 'sfu') return; createPeerConnection(sid, false, name || `User ${sid.substring(0,6)}`); });
     socket.on('user-left', (data) => { const remoteSid = data.sid; logMessage(`User ${data.name || remoteSid.substring(0,6)} left.`); if (peerConnections[remoteSid]) { peerConnections[remoteSid].close(); delete peerConnections[remoteSid]; } const remoteWrapper = document.getElementById(`video-wrapper-${remoteSid}`); if (remoteWrapper) remoteWrapper.remove(); updateVideoLayout(); });
-    socket.on('signal', async (data) => { const { sender_sid, type, payload, name: senderNameFromSignal } = data; if (sender_sid === mySid) return; let pc = peerConnections[sender_sid]; if (!pc && type === 'offer') pc = createPeerConnection(sender_sid, false, senderNameFromSignal || `User ${sender_sid.substring(0,6)}`); else if (!pc) return; try { if (type === 'offer') { await pc.setRemoteDescription(new RTCSessionDescription(payload)); await processPendingCandidates(pc, sender_sid); const answer = await pc.createAnswer(); await pc.setLocalDescription(answer); socket.emit('signal', { target_sid: sender_sid, type: 'answer', payload: answer, name: localUserName }); } else if (type === 'answer') { await pc.setRemoteDescription(new RTCSessionDescription(payload)); await processPendingCandidates(pc, sender_sid); } else if (type === 'candidate' && payload) { if (pc.remoteDescription && pc.remoteDescription.type) await pc.addIceCandidate(new RTCIceCandidate(payload)); else { if (!pc.pendingCandidates) pc.pendingCandidates = []; pc.pendingCandidates.push(payload); } } } catch (error) { console.error(`Signal error ${type} from ${sender_sid}:`, error); } });
+    socket.on('signal', async (data) => { const { sender_sid, type, payload, name: senderNameFromSignal } = data; if (sender_sid === mySid || topology === 'sfu') return; let pc = peerConnections[sender_sid]; if (!pc && type === 'offer') pc = createPeerConnection(sender_sid, false, senderNameFromSignal || `User ${sender_sid.substring(0,6)}`); else if (!pc) return; try { if (type === 'offer') { await pc.setRemoteDescription(new RTCSessionDescription(payload)); await processPendingCandidates(pc, sender_sid); const answer = await pc.createAnswer(); await pc.setLocalDescription(answer); socket.emit('signal', { target_sid: sender_sid, type: 'answer', payload: answer, name: localUserName }); } else if (type === 'answer') { await pc.setRemoteDescription(new RTCSessionDescription(payload)); await processPendingCandidates(pc, sender_sid); } else if (type === 'candidate' && payload) { if (pc.remoteDescription && pc.remoteDescription.type) await pc.addIceCandidate(new RTCIceCandidate(payload)); else { if (!pc.pendingCandidates) pc.pendingCandidates = []; pc.pendingCandidates.push(payload); } } } catch (error) { console.error(`Signal error ${type} from ${sender_sid}:`, error); } });
     async function processPendingCandidates(pc, remoteSid) { if (pc && pc.pendingCandidates && pc.pendingCandidates.length > 0 && pc.remoteDescription && pc.remoteDescription.type) { while(pc.pendingCandidates.length > 0) { const candidate = pc.pendingCandidates.shift(); try { await pc.addIceCandidate(new RTCIceCandidate(candidate)); } catch (error) { console.error(`Error adding buffered ICE for ${remoteSid}:`, error);}} } }
-    socket.on('new-subtitle', (data) => { const { text, sender_sid, name } = data; if (sender_sid === mySid || !currentRoomId) return; displayUserSubtitle(text, name || `User ${sender_sid.substring(0,6)}`); });
+    socket.on('new-subtitles', (data) => { if (!currentRoomId || !data.subtitles) return; data.subtitles.forEach(({ text, sender_sid, name, partial }) => { if (sender_sid === mySid) return; displayUserSubtitle(text, name || `User ${sender_sid.substring(0,6)}`, false, partial, sender_sid); }); });
     socket.on('error', (data) => { logMessage(`Server Error: ${data.message}`); alert(`Server Error: ${data.message}`); });
 
     function createPeerConnection(remoteSid, isInitiator, remoteName = `User ${remoteSid.substring(0,6)}`) {
@@ -248,24 +272,7 @@ document.addEventListener('DOMContentLoaded', () => {
         pc.onicecandidate = (event) => { if (event.candidate) socket.emit('signal', { target_sid: remoteSid, type: 'candidate', payload: event.candidate }); };
         pc.ontrack = (event) => {
             logMessage(`Received remote track from ${remoteName} (${remoteSid.substring(0,6)})`);
-            let remoteVideoWrapper = document.getElementById(`video-wrapper-${remoteSid}`); let remoteVideoEl = document.getElementById(`video-${remoteSid}`);
-            if (!remoteVideoWrapper && videosContainer) {
-                remoteVideoWrapper = document.createElement('div'); remoteVideoWrapper.id = `video-wrapper-${remoteSid}`; remoteVideoWrapper.className = 'video-wrapper';
-                remoteVideoEl = document.createElement('video'); remoteVideoEl.id = `video-${remoteSid}`; remoteVideoEl.autoplay = true; remoteVideoEl.playsInline = true;
-                const nameTag = document.createElement('p'); nameTag.className = 'participant-name-tag'; nameTag.id = `name-tag-${remoteSid}`; nameTag.textContent = remoteName;
-                console.log(`[DEBUG] Setting remote name tag for ${remoteSid} to: ${remoteName}`);
-
-                const maximizeBtnWrapper = document.createElement('div'); maximizeBtnWrapper.className = 'maximize-btn-wrapper';
-                const maximizeBtn = document.createElement('button'); maximizeBtn.className = 'maximize-btn'; maximizeBtn.innerHTML = '⛶';
-                maximizeBtn.title = "Maximize/Restore Video";
-                maximizeBtn.onclick = () => toggleMaximizeVideo(remoteVideoWrapper, maximizeBtn);
-                maximizeBtnWrapper.appendChild(maximizeBtn);
-
-                remoteVideoWrapper.appendChild(remoteVideoEl); remoteVideoWrapper.appendChild(maximizeBtnWrapper); remoteVideoWrapper.appendChild(nameTag);
-                videosContainer.appendChild(remoteVideoWrapper);
-                updateVideoLayout();
-            }
-            if (remoteVideoEl) { if (event.streams && event.streams[0]) remoteVideoEl.srcObject = event.streams[0]; else { const s = new MediaStream(); s.addTrack(event.track); remoteVideoEl.srcObject = s; } }
+            if (event.streams && event.streams[0]) attachRemoteStream(remoteSid, remoteName, event.streams[0]); else { const s = new MediaStream(); s.addTrack(event.track); attachRemoteStream(remoteSid, remoteName, s); }
         };
         pc.oniceconnectionstatechange = () => { if (['failed', 'disconnected', 'closed'].includes(pc.iceConnectionState)) { if (peerConnections[remoteSid]) { peerConnections[remoteSid].close(); delete peerConnections[remoteSid]; } const wrapper = document.getElementById(`video-wrapper-${remoteSid}`); if (wrapper) wrapper.remove(); updateVideoLayout(); } };
         const originalSetRemote = pc.setRemoteDescription.bind(pc); pc.setRemoteDescription = async (d) => { await originalSetRemote(d); await processPendingCandidates(pc, remoteSid); };
@@ -273,6 +280,65 @@ document.addEventListener('DOMContentLoaded', () => {
         return pc;
     }
 
+    function attachRemoteStream(remoteSid, remoteName, stream) {
+        let remoteVideoWrapper = document.getElementById(`video-wrapper-${remoteSid}`); let remoteVideoEl = document.getElementById(`video-${remoteSid}`);
+        if (!remoteVideoWrapper && videosContainer) {
+            remoteVideoWrapper = document.createElement('div'); remoteVideoWrapper.id = `video-wrapper-${remoteSid}`; remoteVideoWrapper.className = 'video-wrapper';
+            remoteVideoEl = document.createElement('video'); remoteVideoEl.id = `video-${remoteSid}`; remoteVideoEl.autoplay = true; remoteVideoEl.playsInline = true;
+            const nameTag = document.createElement('p'); nameTag.className = 'participant-name-tag'; nameTag.id = `name-tag-${remoteSid}`; nameTag.textContent = remoteName;
+            console.log(`[DEBUG] Setting remote name tag for ${remoteSid} to: ${remoteName}`);
+
+            const maximizeBtnWrapper = document.createElement('div'); maximizeBtnWrapper.className = 'maximize-btn-wrapper';
+            const maximizeBtn = document.createElement('button'); maximizeBtn.className = 'maximize-btn'; maximizeBtn.innerHTML = '⛶';
+            maximizeBtn.title = "Maximize/Restore Video";
+            maximizeBtn.onclick = () => toggleMaximizeVideo(remoteVideoWrapper, maximizeBtn);
+            maximizeBtnWrapper.appendChild(maximizeBtn);
+
+            remoteVideoWrapper.appendChild(remoteVideoEl); remoteVideoWrapper.appendChild(maximizeBtnWrapper); remoteVideoWrapper.appendChild(nameTag);
+            videosContainer.appendChild(remoteVideoWrapper);
+            updateVideoLayout();
+        }
+        if (remoteVideoEl && remoteVideoEl.srcObject !== stream) remoteVideoEl.srcObject = stream;
+    }
+
+    // SFU mode: one upstream connection to the server ("publish") and one downstream
+    // connection carrying every other participant's tracks ("subscribe").
+    function waitForIceGathering(pc) {
+        if (pc.iceGatheringState === 'complete') return Promise.resolve();
+        return new Promise(resolve => { const check = () => { if (pc.iceGatheringState === 'complete') { pc.removeEventListener('icegatheringstatechange', check); resolve(); } }; pc.addEventListener('icegatheringstatechange', check); setTimeout(resolve, 3000); });
+    }
+
+    function closeMeshPeerConnections() { for (const sid in peerConnections) { if (peerConnections[sid]) peerConnections[sid].close(); const remoteVideoWrapper = document.getElementById(`video-wrapper-${sid}`); if (remoteVideoWrapper) remoteVideoWrapper.remove(); } Object.keys(peerConnections).forEach(key => delete peerConnections[key]); }
+
+    async function startSfu() {
+        topology = 'sfu'; closeMeshPeerConnections(); updateVideoLayout();
+        const streamToSend = screenStream || localStream;
+        if (!streamToSend || !currentRoomId) return;
+        if (publishPc) publishPc.close();
+        publishPc = new RTCPeerConnection(iceConfiguration);
+        streamToSend.getTracks().forEach(track => { try { publishPc.addTrack(track, streamToSend); } catch (e) { console.error("Error adding track for SFU publish", e); } });
+        try { await publishPc.setLocalDescription(await publishPc.createOffer()); await waitForIceGathering(publishPc); socket.emit('sfu-publish', { room: currentRoomId, sdp: publishPc.localDescription.sdp, type: publishPc.localDescription.type }); }
+        catch (e) { console.error('SFU publish error:', e); }
+        socket.emit('sfu-subscribe', { room: currentRoomId });
+    }
+
+    socket.on('topology-changed', (data) => { if (data.room_id !== currentRoomId || topology === 'sfu') return; logMessage('Room switched to server forwarding.'); startSfu(); });
+    socket.on('sfu-publish-answer', async (data) => { if (!publishPc) return; try { await publishPc.setRemoteDescription(new RTCSessionDescription(data)); } catch (e) { console.error('SFU publish answer error:', e); } });
+    socket.on('sfu-publishers-changed', () => { if (topology === 'sfu' && currentRoomId) socket.emit('sfu-subscribe', { room: currentRoomId }); });
+    socket.on('sfu-subscribe-offer', async (data) => {
+        if (topology !== 'sfu' || !currentRoomId) return;
+        if (subscribePc) subscribePc.close();
+        const owners = {}; data.tracks.forEach(t => { owners[t.mid] = t; });
+        const streams = {};
+        const pc = subscribePc = new RTCPeerConnection(iceConfiguration);
+        pc.ontrack = (event) => { const owner = owners[event.transceiver.mid]; if (!owner) return; const stream = streams[owner.sid] || (streams[owner.sid] = new MediaStream()); stream.addTrack(event.track); attachRemoteStream(owner.sid, owner.name, stream); };
+        document.querySelectorAll('#videos-container [id^="video-wrapper-"]').forEach(w => { if (!data.tracks.some(t => w.id === `video-wrapper-${t.sid}`)) w.remove(); });
+        try { await pc.setRemoteDescription(new RTCSessionDescription({ type: data.type, sdp: data.sdp })); await pc.setLocalDescription(await pc.createAnswer()); await waitForIceGathering(pc); socket.emit('sfu-subscribe-answer', { room: currentRoomId, sdp: pc.localDescription.sdp, type: pc.localDescription.type }); }
+        catch (e) { console.error('SFU subscribe error:', e); }
+        updateVideoLayout();
+    });
+    socket.on('sfu-error', (data) => { logMessage(`SFU error: ${data.message}`); });
+
     function updateRemoteUserName(sid, name) {
         const nameTag = document.getElementById(`name-tag-${sid}`);
         if (nameTag && name) { nameTag.textContent = name; console.log(`[DEBUG] Updated remote name tag for ${sid} to: ${name}`); }
@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class SubtitleAggregator:
+    """Coalesces subtitle-text events into one batched frame per room per window.
+
+    The first subtitle for a room schedules a flush window seconds later; everything
+    that arrives for that room in the meantime goes out with it as a single
+    'new-subtitles' batch. A newer line from a sender replaces that sender's pending
+    partial line. Each sender is limited to max_per_second lines (token bucket); over
+    the limit, a final line is merged into the sender's pending line, or dropped if
+    there is none. Text is truncated to max_chars.
+
+    flush_batch(room_id, subtitles) performs the emit; start_task and sleep are the
+    Socket.IO background-task primitives so the flush works under any async mode.
+    """
+    def __init__(self, flush_batch, start_task, sleep, window=0.15, max_per_second=5.0, max_chars=500):
+        self.flush_batch = flush_batch
+        self.start_task = start_task
+        self.sleep = sleep
+        self.window = window
+        self.max_per_second = max_per_second
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._pending = {} # {room_id: [subtitle, ...]}
+        self._buckets = {} # {sid: [tokens, last_refill]}
+        self.received = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def add(self, room_id, sender_sid, name, text, partial=False):
+        """Queues a subtitle line for room_id. Returns False if it was dropped."""
+        text = text.strip()[:self.max_chars]
+        if not text: return False
+        with self._lock:
+            self.received += 1
+            pending = self._pending.get(room_id)
+            schedule = pending is None
+            if schedule: pending = self._pending[room_id] = []
+            last = next((s for s in reversed(pending) if s['sender_sid'] == sender_sid), None)
+            if last is not None and last['partial']:
+                last['text'] = text; last['partial'] = partial # Superseded partial
+            elif self._take_token(sender_sid):
+                pending.append({'text': text, 'sender_sid': sender_sid, 'name': name, 'partial': partial})
+            elif last is not None and not partial:
+                last['text'] = (last['text'] + ' ' + text)[:self.max_chars]
+            else:
+                self.dropped += 1
+                if schedule: del self._pending[room_id]
+                return False
+        if schedule: self.start_task(self._flush_later, room_id)
+        return True
+
+    def _take_token(self, sid):
+        now = time.monotonic()
+        bucket = self._buckets.get(sid)
+        if bucket is None: bucket = self._buckets[sid] = [self.max_per_second, now]
+        bucket[0] = min(self.max_per_second, bucket[0] + (now - bucket[1]) * self.max_per_second)
+        bucket[1] = now
+        if bucket[0] < 1: return False
+        bucket[0] -= 1
+        return True
+
+    def _flush_later(self, room_id):
+        self.sleep(self.window)
+        self.flush(room_id)
+
+    def flush(self, room_id):
+        with self._lock:
+            batch = self._pending.pop(room_id, None)
+            if batch: self.batches += 1
+        if batch: self.flush_batch(room_id, batch)
+
+    def forget(self, sid):
+        """Drops rate-limit state for a disconnected sid."""
+        with self._lock: self._buckets.pop(sid, None)
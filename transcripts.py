@@ -0,0 +1,120 @@
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptRecorder:
+    """Append-only per-room meeting transcripts.
+
+    record() only appends to an in-memory ring buffer, so the subtitle hot path
+    never touches the disk. A background task drains the buffer every
+    flush_interval seconds and appends each room's lines in one write to
+    <directory>/<room>.jsonl. When a file grows past max_bytes it is rotated to
+    <room>.jsonl.1, .2, ... keeping at most backups old files. If the buffer
+    fills up between flushes the oldest lines are dropped and counted.
+
+    add_participant() records which logged-in users joined a room in
+    <room>.participants, so downloads can be limited to people who took part.
+    The participant sets of the last max_cached_rooms rooms are cached; a lookup
+    that misses rereads the file, since another worker may have appended to it.
+    """
+    def __init__(self, directory, start_task, sleep, flush_interval=2.0, buffer_size=10000,
+                 max_bytes=5 * 1024 * 1024, backups=5, max_cached_rooms=1024):
+        self.directory = directory
+        self.start_task = start_task
+        self.sleep = sleep
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._participants = collections.OrderedDict() # {room_id: set(usernames)}, least recently used first
+        self.max_cached_rooms = max_cached_rooms
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, room_id, name, sender_sid, text):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None: self._flusher = self.start_task(self._run)
+        if len(self._buffer) == self._buffer.maxlen: self.dropped += 1
+        self._buffer.append((room_id, {'ts': time.time(), 'name': name, 'sid': sender_sid, 'text': text}))
+
+    def path_for(self, room_id):
+        if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', room_id): return os.path.join(self.directory, f"{room_id}.jsonl")
+        return os.path.join(self.directory, hashlib.sha256(room_id.encode()).hexdigest() + '.jsonl')
+
+    def _participants_path(self, room_id):
+        return self.path_for(room_id)[:-len('.jsonl')] + '.participants'
+
+    def _load_participants(self, room_id, reload=False):
+        participants = self._participants.get(room_id)
+        if participants is None or reload:
+            try:
+                with open(self._participants_path(room_id), encoding='utf-8') as f: participants = {line.rstrip('\n') for line in f if line.strip()}
+            except FileNotFoundError: participants = set()
+            self._participants[room_id] = participants
+            while len(self._participants) > self.max_cached_rooms: self._participants.popitem(last=False)
+        self._participants.move_to_end(room_id)
+        return participants
+
+    def add_participant(self, room_id, username):
+        """Records that username joined room_id; appends to disk only the first time."""
+        with self._lock:
+            participants = self._load_participants(room_id)
+            if username in participants: return
+            with open(self._participants_path(room_id), 'a', encoding='utf-8') as f: f.write(username + '\n')
+            participants.add(username)
+
+    def is_participant(self, room_id, username):
+        with self._lock:
+            return username in self._load_participants(room_id) or username in self._load_participants(room_id, reload=True)
+
+    def _run(self):
+        while True:
+            self.sleep(self.flush_interval)
+            try: self.flush()
+            except Exception: logger.exception("Transcript flush failed")
+
+    def flush(self):
+        """Writes everything buffered so far, grouped into one append per room."""
+        by_room = {}
+        with self._lock:
+            while self._buffer:
+                room_id, line = self._buffer.popleft()
+                by_room.setdefault(room_id, []).append(json.dumps(line) + '\n')
+        for room_id, lines in by_room.items(): # The buffer is already drained, so one bad room mustn't cost the others their lines
+            try:
+                path = self.path_for(room_id)
+                self._rotate_if_needed(path)
+                with open(path, 'a', encoding='utf-8') as f: f.write(''.join(lines))
+            except Exception: logger.exception("Writing the transcript of room %r failed", room_id)
+
+    def _rotate_if_needed(self, path):
+        try:
+            if os.path.getsize(path) < self.max_bytes: return
+        except OSError: return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"): os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.backups: os.replace(path, f"{path}.1")
+        else: os.remove(path)
+
+    def has_transcript(self, room_id):
+        return os.path.exists(self.path_for(room_id)) or os.path.exists(self.path_for(room_id) + '.1')
+
+    def iter_lines(self, room_id):
+        """Yields a room's raw JSONL transcript lines, oldest first, one at a time."""
+        path = self.path_for(room_id)
+        for candidate in [f"{path}.{i}" for i in range(self.backups, 0, -1)] + [path]:
+            if not os.path.exists(candidate): continue
+            with open(candidate, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip(): yield line
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import queue
+import time
+from collections import OrderedDict
+
+
+class UserStore:
+    """Data access for the users table.
+
+    Connections are opened once in WAL mode with synchronous=NORMAL and a busy
+    timeout and then reused from a small pool, so requests no longer pay for a
+    fresh connect and concurrent readers/writers don't fail with "database is
+    locked". The pool works the same for OS threads and for eventlet/gevent green
+    threads. Connections run in autocommit mode; every operation below is a single
+    statement, which sqlite3 keeps in its per-connection statement cache.
+    """
+    def __init__(self, db_path, busy_timeout=5.0, cached_statements=64, pool_size=8):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None,
+                               cached_statements=self.cached_statements, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        return conn
+
+    def _run(self, sql, params=(), fetch=True):
+        """Runs one statement on a pooled connection; returns the first row, or the rowcount if not fetch."""
+        try: conn = self._pool.get_nowait()
+        except queue.Empty: conn = self._open()
+        try:
+            cur = conn.execute(sql, params)
+            return cur.fetchone() if fetch else cur.rowcount
+        finally:
+            if self._pool.qsize() < self.pool_size: self._pool.put(conn)
+            else: conn.close()
+
+    def close(self):
+        """Closes all idle pooled connections."""
+        while True:
+            try: self._pool.get_nowait().close()
+            except queue.Empty: return
+
+    def init_schema(self):
+        self._run('''CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT UNIQUE NOT NULL,
+                        password TEXT NOT NULL,
+                        otp TEXT,
+                        verified INTEGER DEFAULT 0
+                    )''', fetch=False)
+
+    def get_by_username(self, username):
+        """Returns the user row or None."""
+        return self._run("SELECT * FROM users WHERE username = ?", (username,))
+
+    def get_by_credentials(self, username, password):
+        """Returns the user row matching username and password, or None."""
+        return self._run("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
+
+    def is_verified(self, username):
+        row = self._run("SELECT verified FROM users WHERE username = ?", (username,))
+        return bool(row and row['verified'])
+
+    def create(self, username, password, otp):
+        """Inserts an unverified user. Raises sqlite3.IntegrityError if username exists."""
+        self._run("INSERT INTO users (username, password, otp, verified) VALUES (?, ?, ?, 0)", (username, password, otp), fetch=False)
+
+    def set_otp(self, username, otp):
+        self._run("UPDATE users SET otp = ? WHERE username = ?", (otp, username), fetch=False)
+
+    def mark_verified(self, username, otp):
+        """Verifies username if otp matches its pending OTP. Returns True on success."""
+        return self._run("UPDATE users SET verified = 1, otp = NULL WHERE username = ? AND verified = 0 AND otp = ?", (username, otp), fetch=False) == 1
+
+
+class VerificationCache:
+    """In-process TTL/LRU cache of users' verified flag.
+
+    Entries are (verified, stamp, expires_at). invalidate() replaces a user's entry
+    with a tombstone stamped with the invalidation time, so verification stamps
+    stored in sessions before that time are no longer trusted. Hit/miss counters
+    are exposed through stats().
+    """
+    def __init__(self, ttl=300.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username):
+        """Returns (verified, stamp) for a live entry, or None. verified is None for a tombstone."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None: return None
+            if entry[2] < time.monotonic(): del self._entries[username]; return None
+            self._entries.move_to_end(username)
+            return entry[0], entry[1]
+
+    def put(self, username, verified, stamp=None):
+        stamp = time.time() if stamp is None else stamp
+        with self._lock:
+            self._entries[username] = (verified, stamp, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+        return stamp
+
+    def invalidate(self, username):
+        self.put(username, None)
+
+    def record(self, hit):
+        with self._lock:
+            if hit: self.hits += 1
+            else: self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}